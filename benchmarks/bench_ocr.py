@@ -0,0 +1,58 @@
+"""OCR throughput on a local corpus of to-do list photos
+
+Usage: python benchmarks/bench_ocr.py CORPUS_DIR [--workers 1,2,4] [--preprocess-only]
+
+CORPUS_DIR holds sample .jpg/.png images. Each worker count runs the
+whole corpus through a process pool, as the bot does, and reports images
+per second. --preprocess-only times the Pillow step alone (no tesseract).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ocr import extract_lines, preprocess
+
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def load_corpus(path):
+    images = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(EXTENSIONS):
+            with open(os.path.join(path, name), 'rb') as f:
+                images.append(f.read())
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--preprocess-only', action='store_true')
+    args = parser.parse_args()
+
+    images = load_corpus(args.corpus)
+    if not images:
+        sys.exit(f"no images in {args.corpus}")
+    job = preprocess if args.preprocess_only else extract_lines
+    size = sum(len(i) for i in images) / 1024 / 1024
+    print(f"images: {len(images)} ({size:.1f} MiB), job: {job.__name__}")
+
+    for workers in (int(w) for w in args.workers.split(',')):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Warm the workers up so process start-up isn't timed
+            list(pool.map(job, images[:workers]))
+            start = time.perf_counter()
+            results = list(pool.map(job, images))
+            elapsed = time.perf_counter() - start
+        lines = sum(len(r) for r in results) if job is extract_lines else 0
+        print(f"workers={workers}: {elapsed:.2f}s, {len(images) / elapsed:.1f} images/s"
+              + (f", {lines} lines" if lines else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Quick-add parser throughput on large pasted task lists
+
+Usage: python benchmarks/bench_quickadd.py [lines]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quickadd import parse_lines
+
+CATEGORIES = ['Work', 'Personal', 'Health']
+WORDS = ['Finish', 'report', 'call', 'dentist', 'buy', 'groceries', 'review', 'PR', 'plan', 'sprint', 'gym']
+ANNOTATIONS = ['#work', '#health', '#personal', '@14:30', '@9:05', '!daily', '!weekly', '30m', '1h30m', '45min']
+
+
+def make_text(lines, seed=1):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        words = rng.sample(WORDS, rng.randint(2, 5))
+        # Roughly one line in five is plain text for the interactive flow
+        if rng.random() > 0.2:
+            words += rng.sample(ANNOTATIONS, rng.randint(1, 3))
+        rng.shuffle(words)
+        out.append(' '.join(words))
+    return '\n'.join(out)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    text = make_text(lines)
+
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        parsed, plain = parse_lines(text, CATEGORIES)
+        best = min(best, time.perf_counter() - start)
+
+    print(f"lines:       {lines} ({len(text) / 1024:.0f} KiB)")
+    print(f"annotated:   {len(parsed)}")
+    print(f"plain:       {len(plain)}")
+    print(f"best of 5:   {best * 1000:.1f} ms ({lines / best:,.0f} lines/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Bulk export/import throughput in records per second
+
+Usage: python benchmarks/bench_transfer.py [users] [--workers 1,2,4] [--gzip] [--memory]
+
+Fills an in-memory store with synthetic users, exports it in each format
+to a temporary file, then imports that file into a fresh store with each
+worker count. Every HEAVY_EVERY-th user has HEAVY_ARCHIVED archived
+tasks, so records well past the csv module's default field limit are
+always part of the run. --memory also reports the peak traced
+allocation during export, which should stay flat as the user count grows.
+
+Into a MemoryStore the import is CPU-bound (JSON decode and re-encode),
+so extra workers only pay off against a store that waits on I/O, such
+as PostgresStore.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from codec import encode_team, encode_user
+from models import Habit, Task, User
+from storage import MemoryStore
+from transfer import FORMATS, export_to_file, import_from_file
+
+HABITS = 5
+TRACKED_DAYS = 60
+TASKS = 10
+ARCHIVED = 30
+HEAVY_EVERY = 500
+HEAVY_ARCHIVED = 3000
+TEAMS = 100
+
+
+def make_user(i):
+    archived = HEAVY_ARCHIVED if i % HEAVY_EVERY == 0 else ARCHIVED
+    user = User('en' if i % 4 else 'ar')
+    user.set_goals([f"Goal {g} of user {i}" for g in range(3)])
+    user.habits = [Habit(f"Habit {h}", range(20000, 20000 + TRACKED_DAYS), TRACKED_DAYS, TRACKED_DAYS)
+                   for h in range(HABITS)]
+    for t in range(archived + TASKS):
+        task = user.add_task(Task(f"Task {t} of user {i}", 'Work', time='14:30'))
+        if t % 3 == 0:
+            user.link_task(task, t % 3)
+        if t < archived:
+            user.tasks.complete(task.id)
+    user.archive_completed()
+    user.points = i
+    return user
+
+
+def make_store(users):
+    store = MemoryStore()
+    store.put_user_records((i, encode_user(make_user(i))) for i in range(users))
+    store.put_team_records((f"team{t}", encode_team({'members': list(range(t, t + 5)), 'shared_goals': []}))
+                           for t in range(TEAMS))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('users', nargs='?', type=int, default=5000)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--memory', action='store_true')
+    args = parser.parse_args()
+
+    store = make_store(args.users)
+    records = store.count_users() + store.count_teams()
+    size = sum(len(r) for r in store.users.values()) / 1024 / 1024
+    print(f"records:   {records} ({size:.1f} MiB encoded)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"export.{fmt}" + ('.gz' if args.gzip else ''))
+
+            start = time.perf_counter()
+            export_to_file(store, path, fmt)
+            elapsed = time.perf_counter() - start
+            print(f"{fmt:6} export:            {elapsed:6.2f}s, {records / elapsed:10,.0f} records/s, "
+                  f"{os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+
+            if args.memory:
+                tracemalloc.start()
+                export_to_file(store, path, fmt)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{fmt:6} export peak memory: {peak / 1024:.0f} KiB")
+
+            for workers in (int(w) for w in args.workers.split(',')):
+                target = MemoryStore()
+                start = time.perf_counter()
+                imported = import_from_file(target, path, fmt, workers=workers)
+                elapsed = time.perf_counter() - start
+                assert imported == records
+                print(f"{fmt:6} import workers={workers}: {elapsed:6.2f}s, {records / elapsed:10,.0f} records/s")
+
+
+if __name__ == '__main__':
+    main()
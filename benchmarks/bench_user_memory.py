@@ -0,0 +1,91 @@
+"""Bytes per user: legacy dict-of-dicts record vs the __slots__ models
+
+Usage: python benchmarks/bench_user_memory.py [users]
+"""
+import os
+import sys
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import User
+
+HABITS = 5
+TRACKED_DAYS = 60
+TASKS = 10
+GOALS = 3
+
+
+def legacy_user(i):
+    """A user in the dict layout ProductivityDB.get_user used to build"""
+    today = date(2026, 10, 19)
+    now = datetime(2026, 10, 19, 9, 0)
+    return {
+        'language': 'en' if i % 4 else 'ar',
+        'monthly_goals': [
+            {'goal': f"Goal {g} of user {i}", 'created': now.isoformat(), 'progress': 0, 'milestones': []}
+            for g in range(GOALS)
+        ],
+        'habits': [
+            {
+                'habit': f"Habit {h}",
+                'tracking': [(today - timedelta(days=d)).isoformat() for d in range(TRACKED_DAYS, 0, -1)],
+                'streak': TRACKED_DAYS,
+                'best_streak': TRACKED_DAYS
+            }
+            for h in range(HABITS)
+        ],
+        'habit_streaks': {},
+        'tasks': [
+            {
+                'task': f"Task {t} of user {i}",
+                # Category text comes from a Telegram message, so each task
+                # holds its own copy
+                'category': ''.join(['Wo', 'rk']),
+                'recurring': None,
+                'time': '14:30',
+                'completed': bool(t % 2),
+                'created': now.isoformat()
+            }
+            for t in range(TASKS)
+        ],
+        'recurring_tasks': [],
+        'completed_tasks': [],
+        'categories': ['Work', 'Personal', 'Health'],
+        'pomodoro_settings': {'work': 25, 'break': 5, 'long_break': 15},
+        'pomodoro_count': 0,
+        'weekly_reports': [],
+        'monthly_reports': [],
+        'annual_reports': [],
+        'team_id': None,
+        'points': 0,
+        'achievements': []
+    }
+
+
+def measure(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return (after - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    dict_bytes = measure(legacy_user, count)
+    # The intermediate dict is freed once converted; only what the model
+    # keeps (including its task and habit strings) stays traced
+    model_bytes = measure(lambda i: User.from_dict(legacy_user(i)), count)
+
+    print(f"users:          {count}")
+    print(f"dict layout:    {dict_bytes:10.0f} bytes/user")
+    print(f"slots models:   {model_bytes:10.0f} bytes/user")
+    print(f"saving:         {100.0 * (1 - model_bytes / dict_bytes):9.1f}%")
+
+
+if __name__ == '__main__':
+    main()
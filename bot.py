@@ -2,8 +2,11 @@ import os
 import os  
 import json
 import logging
-from datetime import datetime, timedelta
+import asyncio
+import math
+from datetime import datetime, timedelta, time as dt_time
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
 Application, CommandHandler, MessageHandler, CallbackQueryHandler,
 filters, ContextTypes, ConversationHandler
@@ -20,6 +23,18 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from profiler import SamplingProfiler, application_callbacks
+from models import User, Habit, Task, DEFAULT_CATEGORIES, today_epoch_day
+from codec import encode_user, decode_user, upgrade_user, encode_team, decode_team, upgrade_team, peek_language
+from quickadd import parse_lines
+from dashboard import DashboardRegistry, digest
+from pomodoro import SessionManager, WORK, SHORT_BREAK, LONG_BREAK, EDIT_BUDGET
+from workers import BoundedPool, PoolFull, RateLimiter
+from ocr import extract_lines
+from voice import VoicePipeline, model_available as voice_model_available
+from daily_digest import escape, render_morning, render_evening, run_digest
+from storage import MemoryStore
+from transfer import FORMATS, export_to_file
 
 # ==================== TRANSLATIONS ====================
 
@@ -57,8 +72,30 @@ TRANSLATIONS = {
 "📄 /export - Export PDF\n"
 "🌍 /language - Change language"
 ),
-'add_tasks': "✏️ *Enter your tasks* (one per line)\n\nExample:\nBuy groceries\nFinish report\nCall dentist",
+'add_tasks': "✏️ *Enter your tasks* (one per line)\n\nExample:\nBuy groceries\nFinish report\nCall dentist\n\n⚡ Skip the questions by tagging a line:\nFinish report #work @14:30 !daily\nCall dentist #health 30m\nWrite chapter +1 1h",
 'got_tasks': "📋 *Got {count} tasks!*\n\n🏷️ Task 1: {task}\n\nSelect category:",
+'quick_added': "⚡ *Added {count} tagged tasks.*\n\n",
+'ocr_busy': "⏳ I'm reading a lot of photos right now. Please send yours again in a minute.",
+'ocr_rate_limited': "📷 That's a lot of photos! Please wait a few minutes before sending another.",
+'ocr_failed': "😕 I couldn't read that photo. Try a sharper, well-lit picture.",
+'ocr_nothing': "😕 I couldn't find any tasks in that photo.",
+'voice_busy': "⏳ I'm listening to a lot of voice notes right now. Please send yours again in a minute.",
+'voice_rate_limited': "🎙️ That's a lot of voice notes! Please wait a few minutes before sending another.",
+'voice_too_long': "🎙️ Please keep voice notes under {seconds} seconds.",
+'voice_failed': "😕 I couldn't understand that voice note.",
+'voice_nothing': "😕 I didn't hear any tasks in that voice note.",
+'digest_morning_title': "🌅 *Good morning!* Here's your day:\n\n",
+'digest_evening_title': "🌙 *Evening review*\n\n",
+'digest_open_tasks': "📋 Open tasks: {count}\n",
+'digest_pending_habits': "🎯 Habits to do today: {count}\n",
+'digest_streaks_at_risk': "🔥 Keep these streaks alive: {habits}\n",
+'digest_done_today': "✅ Tasks done: {done}/{total}\n",
+'digest_habits_done': "🎯 Habits done: {done}/{total}\n",
+'digest_keep_streaks': "⚠️ Still time to save: {habits}\n",
+'digest_points': "⭐ Points: {points}\n",
+'digest_off_hint': "\n_Turn these off with /digest_",
+'digest_enabled': "🔔 Daily digest turned on.",
+'digest_disabled': "🔕 Daily digest turned off. Send /digest to turn it back on.",
 'recurring_prompt': "🔁 Is this a *recurring* task?\n\nTask: {task}",
 'time_prompt': "⏰ *Task:* {task}\n\nEnter time:\n• HH:MM format (e.g., 14:30)\n• Or duration in minutes (e.g., 30)",
 'next_task': "🏷️ *Task {num}:* {task}\n\nSelect category:",
@@ -82,11 +119,12 @@ TRANSLATIONS = {
 'great_day': "🎉 Great day!",
 'keep_going': "💪 Keep going!",
 'generating_pdf': "📄 Generating PDF report...",
+'mydata_caption': "🗂️ Everything stored about you",
 'help_title': "📚 *Command Reference*\n\n",
 'help_getting_started': "*Getting Started:*\n/start - Setup goals & habits\n/language - Change language\n\n",
-'help_daily': "*Daily Use:*\n/add - Add new tasks\n/habits - Check off habits\n/pomodoro - Focus timer\n/status - Today's progress\n\n",
-'help_management': "*Management:*\n/goals - Update goals\n/team - Team features\n\n",
-'help_reports': "*Reports:*\n/report - View reports\n/export - Download PDF\n\n",
+'help_daily': "*Daily Use:*\n/add - Add new tasks\n/tasks - Complete tasks\n/habits - Check off habits\n/pomodoro - Focus timer\n/status - Today's progress\n\n",
+'help_management': "*Management:*\n/goals - Goal progress\n/link - Link a habit to a goal\n/team - Team features\n/digest - Daily digest on/off\n\n",
+'help_reports': "*Reports:*\n/report - View reports\n/export - Download PDF\n/mydata - Download all your data\n\n",
 'help_tip': "💡 Tip: Use quick reply buttons for faster access!",
 'no_habits': "No habits set. Use /start to set up.",
 'all_done': "✨ All Done!",
@@ -107,6 +145,30 @@ TRANSLATIONS = {
 'help_btn': "❓ Help",
 'select_language': "🌍 *Select Your Language / اختر لغتك*",
 'language_changed': "✅ Language changed to English!",
+'tasks_title': "📋 *Today's Tasks* ({done}/{total} done)\n\nTap a task to mark it done:",
+'no_open_tasks': "🎉 No open tasks! Add more with /add",
+'task_completed': "✅ Done: {task}",
+'tasks_more': "+{count} more ▶",
+'tasks_back': "◀ Back",
+'habit_already_done': "✅ Already checked today",
+'goals_title': "🎯 *Monthly Goals*\n\n",
+'goal_line': "{index}. {goal}\n{bar} {progress}% ({done}/{target})\n\n",
+'no_goals': "No goals set. Use /start to set them up.",
+'goals_hint': "_Link tasks with +N in /add (e.g. Write chapter +1) and habits with /link <habit> <goal>_",
+'goal_milestone': "\n\n🎊 *GOAL MILESTONE!* {goal}: {percent}%",
+'link_usage': "Usage: /link <habit number> <goal number>\n\n*Habits:*\n{habits}\n\n*Goals:*\n{goals}",
+'habit_linked': "🔗 {habit} now counts toward {goal}",
+'habit_already_linked': "🔗 {habit} already counts toward {goal}. Goals reset with /start.",
+'refresh_btn': "🔄 Refresh",
+'pause_btn': "⏸️ Pause",
+'resume_btn': "▶️ Resume",
+'stop_btn': "⏹️ Stop",
+'live_on_btn': "⏱️ Live countdown",
+'live_off_btn': "⏱️ Hide countdown",
+'pomo_left': "\n\n⏳ {left} min left",
+'pomo_paused': "\n\n⏸️ Paused with {left} min left",
+'pomo_stopped': "⏹️ Pomodoro stopped.",
+'pomo_no_session': "No active Pomodoro. Start one with /pomodoro",
 },
 'ar': {
 'welcome': (
@@ -141,8 +203,30 @@ TRANSLATIONS = {
 "📄 /export - تصدير PDF\n"
 "🌍 /language - تغيير اللغة"
 ),
-'add_tasks': "✏️ *أدخل مهامك* (مهمة في كل سطر)\n\nمثال:\nشراء البقالة\nإنهاء التقرير\nالاتصال بالطبيب",
+'add_tasks': "✏️ *أدخل مهامك* (مهمة في كل سطر)\n\nمثال:\nشراء البقالة\nإنهاء التقرير\nالاتصال بالطبيب\n\n⚡ تخطَّ الأسئلة بإضافة وسوم للسطر:\nإنهاء التقرير #عمل @14:30 !daily\nالاتصال بالطبيب #صحة 30m\nكتابة فصل +1 1h",
 'got_tasks': "📋 *تم الحصول على {count} مهمة!*\n\n🏷️ المهمة 1: {task}\n\nاختر التصنيف:",
+'quick_added': "⚡ *تمت إضافة {count} مهمة موسومة.*\n\n",
+'ocr_busy': "⏳ أقرأ الكثير من الصور الآن. أرسل صورتك مرة أخرى بعد دقيقة.",
+'ocr_rate_limited': "📷 صور كثيرة! انتظر بضع دقائق قبل إرسال صورة أخرى.",
+'ocr_failed': "😕 لم أتمكن من قراءة الصورة. جرب صورة أوضح بإضاءة جيدة.",
+'ocr_nothing': "😕 لم أجد أي مهام في هذه الصورة.",
+'voice_busy': "⏳ أستمع إلى الكثير من الرسائل الصوتية الآن. أرسل رسالتك مرة أخرى بعد دقيقة.",
+'voice_rate_limited': "🎙️ رسائل صوتية كثيرة! انتظر بضع دقائق قبل إرسال رسالة أخرى.",
+'voice_too_long': "🎙️ اجعل الرسائل الصوتية أقل من {seconds} ثانية.",
+'voice_failed': "😕 لم أتمكن من فهم الرسالة الصوتية.",
+'voice_nothing': "😕 لم أسمع أي مهام في الرسالة الصوتية.",
+'digest_morning_title': "🌅 *صباح الخير!* إليك يومك:\n\n",
+'digest_evening_title': "🌙 *مراجعة المساء*\n\n",
+'digest_open_tasks': "📋 المهام المفتوحة: {count}\n",
+'digest_pending_habits': "🎯 عادات اليوم المتبقية: {count}\n",
+'digest_streaks_at_risk': "🔥 حافظ على هذه السلاسل: {habits}\n",
+'digest_done_today': "✅ المهام المنجزة: {done}/{total}\n",
+'digest_habits_done': "🎯 العادات المنجزة: {done}/{total}\n",
+'digest_keep_streaks': "⚠️ لا يزال هناك وقت لإنقاذ: {habits}\n",
+'digest_points': "⭐ النقاط: {points}\n",
+'digest_off_hint': "\n_أوقف هذه الرسائل باستخدام /digest_",
+'digest_enabled': "🔔 تم تفعيل الملخص اليومي.",
+'digest_disabled': "🔕 تم إيقاف الملخص اليومي. أرسل /digest لتفعيله مرة أخرى.",
 'recurring_prompt': "🔁 هل هذه مهمة *متكررة*؟\n\nالمهمة: {task}",
 'time_prompt': "⏰ *المهمة:* {task}\n\nأدخل الوقت:\n• صيغة HH:MM (مثل 14:30)\n• أو المدة بالدقائق (مثل 30)",
 'next_task': "🏷️ *المهمة {num}:* {task}\n\nاختر التصنيف:",
@@ -166,11 +250,12 @@ TRANSLATIONS = {
 'great_day': "🎉 يوم رائع!",
 'keep_going': "💪 استمر!",
 'generating_pdf': "📄 جاري إنشاء تقرير PDF...",
+'mydata_caption': "🗂️ كل البيانات المخزنة عنك",
 'help_title': "📚 *مرجع الأوامر*\n\n",
 'help_getting_started': "*البداية:*\n/start - إعداد الأهداف والعادات\n/language - تغيير اللغة\n\n",
-'help_daily': "*الاستخدام اليومي:*\n/add - إضافة مهام جديدة\n/habits - تحديد العادات\n/pomodoro - مؤقت التركيز\n/status - تقدم اليوم\n\n",
-'help_management': "*الإدارة:*\n/goals - تحديث الأهداف\n/team - ميزات الفريق\n\n",
-'help_reports': "*التقارير:*\n/report - عرض التقارير\n/export - تنزيل PDF\n\n",
+'help_daily': "*الاستخدام اليومي:*\n/add - إضافة مهام جديدة\n/tasks - إنجاز المهام\n/habits - تحديد العادات\n/pomodoro - مؤقت التركيز\n/status - تقدم اليوم\n\n",
+'help_management': "*الإدارة:*\n/goals - تقدم الأهداف\n/link - ربط عادة بهدف\n/team - ميزات الفريق\n/digest - تشغيل/إيقاف الملخص اليومي\n\n",
+'help_reports': "*التقارير:*\n/report - عرض التقارير\n/export - تنزيل PDF\n/mydata - تنزيل كل بياناتك\n\n",
 'help_tip': "💡 نصيحة: استخدم أزرار الرد السريع للوصول الأسرع!",
 'no_habits': "لم يتم تعيين عادات. استخدم /start للإعداد.",
 'all_done': "✨ تم الكل!",
@@ -191,51 +276,80 @@ TRANSLATIONS = {
 'help_btn': "❓ مساعدة",
 'select_language': "🌍 *اختر لغتك / Select Your Language*",
 'language_changed': "✅ تم تغيير اللغة إلى العربية!",
+'tasks_title': "📋 *مهام اليوم* (تم {done}/{total})\n\nانقر على مهمة لتحديدها كمنجزة:",
+'no_open_tasks': "🎉 لا توجد مهام مفتوحة! أضف المزيد باستخدام /add",
+'task_completed': "✅ تم: {task}",
+'tasks_more': "+{count} أخرى ▶",
+'tasks_back': "◀ رجوع",
+'habit_already_done': "✅ تم التحديد اليوم بالفعل",
+'goals_title': "🎯 *الأهداف الشهرية*\n\n",
+'goal_line': "{index}. {goal}\n{bar} {progress}% ({done}/{target})\n\n",
+'no_goals': "لا توجد أهداف. استخدم /start لتعيينها.",
+'goals_hint': "_اربط المهام باستخدام +N في /add (مثال: كتابة فصل +1) والعادات باستخدام /link <العادة> <الهدف>_",
+'goal_milestone': "\n\n🎊 *إنجاز في الهدف!* {goal}: {percent}%",
+'link_usage': "الاستخدام: /link <رقم العادة> <رقم الهدف>\n\n*العادات:*\n{habits}\n\n*الأهداف:*\n{goals}",
+'habit_linked': "🔗 {habit} تُحتسب الآن ضمن {goal}",
+'habit_already_linked': "🔗 {habit} تُحتسب بالفعل ضمن {goal}. يمكن إعادة تعيين الأهداف باستخدام /start.",
+'refresh_btn': "🔄 تحديث",
+'pause_btn': "⏸️ إيقاف مؤقت",
+'resume_btn': "▶️ استئناف",
+'stop_btn': "⏹️ إيقاف",
+'live_on_btn': "⏱️ عد تنازلي مباشر",
+'live_off_btn': "⏱️ إخفاء العد التنازلي",
+'pomo_left': "\n\n⏳ متبقي {left} دقيقة",
+'pomo_paused': "\n\n⏸️ متوقف مؤقتاً، متبقي {left} دقيقة",
+'pomo_stopped': "⏹️ تم إيقاف بومودورو.",
+'pomo_no_session': "لا توجد جلسة بومودورو نشطة. ابدأ واحدة باستخدام /pomodoro",
 }
 }
 
 # Database class
 
-class ProductivityDB:
+class ProductivityDB(MemoryStore):
 # Change this line:
 # def __init__(self):
 # To this line:
 def __init__(self, db_url):
 # Now, use db_url to establish your connection
 # ... your connection logic here ...
-self.users = {}
-self.teams = {}
+# Records are stored encoded (see codec.py); older versions are migrated
+# on first read and written back, so each record is upgraded only once
+super().__init__()
+
+def _current_user(self, user_id, record):
+upgraded = upgrade_user(record)
+if upgraded is not record:
+self.users[user_id] = upgraded
+return upgraded
 
 def get_user(self, user_id):
 if user_id not in self.users:
-self.users[user_id] = {
-'language': 'en',  # Default language
-'monthly_goals': [],
-'habits': [],
-'habit_streaks': {},
-'tasks': [],
-'recurring_tasks': [],
-'completed_tasks': [],
-'categories': ['Work', 'Personal', 'Health'],
-'pomodoro_settings': {'work': 25, 'break': 5, 'long_break': 15},
-'pomodoro_count': 0,
-'weekly_reports': [],
-'monthly_reports': [],
-'annual_reports': [],
-'team_id': None,
-'points': 0,
-'achievements': []
-}
-return self.users[user_id]
+self.users[user_id] = encode_user(User())  # Default language: English
+return decode_user(self._current_user(user_id, self.users[user_id]))
+
+def get_language(self, user_id):
+record = self.users.get(user_id)
+return peek_language(self._current_user(user_id, record)) if record is not None else 'en'
 
 def save_user(self, user_id, data):
-self.users[user_id] = data
+self.users[user_id] = encode_user(data)
 
 def get_team(self, team_id):
-return self.teams.get(team_id, {'members': [], 'shared_goals': []})
+record = self.teams.get(team_id)
+if record is None:
+return {'members': [], 'shared_goals': []}
+upgraded = upgrade_team(record)
+if upgraded is not record:
+self.teams[team_id] = upgraded
+return decode_team(upgraded)
 
 def save_team(self, team_id, data):
-self.teams[team_id] = data
+self.teams[team_id] = encode_team(data)
+
+def iter_users(self, chunk_size=500):
+"""Yield lists of (user_id, user), decoding one chunk at a time"""
+for chunk in self.iter_user_records(chunk_size):
+yield [(user_id, decode_user(self._current_user(user_id, record))) for user_id, record in chunk]
 
  import os # Make sure this is at the very top of your file
 # Make sure this is at the very top of your file
@@ -245,6 +359,36 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 
 # Pass the URL to your database class
 db = ProductivityDB(DATABASE_URL)
+dashboards = DashboardRegistry()
+pomodoros = SessionManager()
+
+# Telegram user ids allowed to run admin commands such as /profile
+ADMIN_IDS = {int(i) for i in os.getenv('ADMIN_IDS', '').split(',') if i.strip()}
+PROFILE_MAX_SECONDS = 300
+# Seconds between passes of the live Pomodoro countdown ticker
+POMODORO_TICK = 5
+
+# Daily digests go out starting at these times, spread across DIGEST_WINDOW seconds
+DIGEST_MORNING = dt_time.fromisoformat(os.getenv('DIGEST_MORNING', '07:00'))
+DIGEST_EVENING = dt_time.fromisoformat(os.getenv('DIGEST_EVENING', '20:00'))
+DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', '1800'))
+
+# Photo OCR runs in worker processes; extra photos are refused, not queued
+ocr_pool = BoundedPool(
+workers=int(os.getenv('OCR_WORKERS', '2')),
+max_pending=int(os.getenv('OCR_MAX_PENDING', '8'))
+)
+ocr_limiter = RateLimiter(limit=5, period=600)
+
+# Voice notes: ffmpeg + offline speech-to-text, same admission rules
+voice_pipeline = VoicePipeline(
+workers=int(os.getenv('VOICE_WORKERS', '1')),
+max_pending=int(os.getenv('VOICE_MAX_PENDING', '4'))
+)
+voice_limiter = RateLimiter(limit=5, period=600)
+MAX_VOICE_SECONDS = 120
+# Voice handlers are only registered when the speech model is installed
+VOICE_ENABLED = voice_model_available()
 
 
 # Conversation states
@@ -261,8 +405,7 @@ logger = logging.getLogger(__name__)
 
 def get_text(user_id, key, **kwargs):
 """Get translated text for user's language"""
-user_data = db.get_user(user_id)
-lang = user_data.get('language', 'en')
+lang = db.get_language(user_id)
 text = TRANSLATIONS[lang].get(key, TRANSLATIONS['en'][key])
 if kwargs:
 text = text.format(**kwargs)
@@ -270,7 +413,7 @@ return text
 
 def get_category_name(user_id, category):
 """Get translated category name"""
-lang = db.get_user(user_id).get('language', 'en')
+lang = db.get_language(user_id)
 categories = {
 'Work': TRANSLATIONS[lang]['work'],
 'Personal': TRANSLATIONS[lang]['personal'],
@@ -278,6 +421,14 @@ categories = {
 }
 return categories.get(category, category)
 
+# Telegram rejects callback query answers longer than this
+ANSWER_LIMIT = 200
+
+def answer_text(text):
+"""Plain text for query.answer(), cut to fit ANSWER_LIMIT"""
+text = text.replace('*', '')
+return text if len(text) <= ANSWER_LIMIT else text[:ANSWER_LIMIT - 1] + "…"
+
 # ==================== LANGUAGE SELECTION ====================
 
 async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -300,12 +451,12 @@ user_id = query.from_user.id
 user_data = db.get_user(user_id)
 
 if query.data == "lang_en":
-user_data['language'] = 'en'
-user_data['categories'] = ['Work', 'Personal', 'Health']
+user_data.language = 'en'
+user_data.categories = DEFAULT_CATEGORIES
 msg = "✅ Language changed to English!"
 else:
-user_data['language'] = 'ar'
-user_data['categories'] = ['عمل', 'شخصي', 'صحة']
+user_data.language = 'ar'
+user_data.categories = ('عمل', 'شخصي', 'صحة')
 msg = "✅ تم تغيير اللغة إلى العربية!"
 
 db.save_user(user_id, user_data)
@@ -318,7 +469,7 @@ user_id = update.effective_user.id
 
 # First time users - select language
 user_data = db.get_user(user_id)
-if not user_data.get('language'):
+if not user_data.language:
 keyboard = [
 [InlineKeyboardButton("🇬🇧 English", callback_data="lang_en_start")],
 [InlineKeyboardButton("🇸🇦 العربية", callback_data="lang_ar_start")]
@@ -343,11 +494,11 @@ user_id = query.from_user.id
 user_data = db.get_user(user_id)
 
 if 'en' in query.data:
-user_data['language'] = 'en'
-user_data['categories'] = ['Work', 'Personal', 'Health']
+user_data.language = 'en'
+user_data.categories = DEFAULT_CATEGORIES
 else:
-user_data['language'] = 'ar'
-user_data['categories'] = ['عمل', 'شخصي', 'صحة']
+user_data.language = 'ar'
+user_data.categories = ('عمل', 'شخصي', 'صحة')
 
 db.save_user(user_id, user_data)
 
@@ -361,15 +512,7 @@ goals_text = update.message.text
 goals = [g.strip() for g in goals_text.split('\n') if g.strip()]
 
 user_data = db.get_user(user_id)
-user_data['monthly_goals'] = [
-{
-'goal': g, 
-'created': datetime.now().isoformat(), 
-'progress': 0,
-'milestones': []
-}
-for g in goals[:3]
-]
+user_data.set_goals(goals[:3])
 db.save_user(user_id, user_data)
 
 goals_text = get_text(user_id, 'goals_set') + "\n".join([f"{i+1}. {g}" for i, g in enumerate(goals[:3])])
@@ -387,18 +530,9 @@ habits_text = update.message.text
 habits = [h.strip() for h in habits_text.split('\n') if h.strip()]
 
 user_data = db.get_user(user_id)
-user_data['habits'] = [
-{
-'habit': h, 
-'tracking': [],
-'streak': 0,
-'best_streak': 0
-} 
-for h in habits
-]
+user_data.habits = [Habit(h) for h in habits]
 db.save_user(user_id, user_data)
 
-lang = user_data.get('language', 'en')
 keyboard = [
 [get_text(user_id, 'add_tasks_btn'), get_text(user_id, 'check_habits_btn')],
 [get_text(user_id, 'pomodoro_btn'), get_text(user_id, 'status_btn')],
@@ -417,27 +551,82 @@ return ConversationHandler.END
 
 # ==================== TASK MANAGEMENT ====================
 
+def save_task_data(user_id, task_data):
+"""Store task dicts collected by /add and award points for them
+
+Returns (points, indices of the tasks that were linked to their goal).
+"""
+user_data = db.get_user(user_id)
+linked = set()
+for i, task in enumerate(task_data):
+new_task = Task.from_dict(task)
+# Linked through the user so the goal's target counts the task
+goal, new_task.goal = new_task.goal, None
+if task.get('recurring'):
+user_data.recurring_tasks.append(new_task)
+else:
+user_data.add_task(new_task)
+# Recurring templates are never completed, so they can't count toward a goal
+if goal is not None and not new_task.recurring and goal < len(user_data.monthly_goals):
+user_data.link_task(new_task, goal)
+linked.add(i)
+
+points = len(task_data) * 5
+user_data.points += points
+
+db.save_user(user_id, user_data)
+return points, linked
+
+def format_task_summary(task_data, linked=()):
+return "\n".join([
+f"{i+1}. \\[{escape(t['category'])}] {escape(t['task'])}" +
+(f" - {t['time']}" if t.get('time') else "") +
+(f" ({t['recurring']})" if t.get('recurring') else "") +
+(f" 🎯{t['goal'] + 1}" if i in linked else "")
+for i, t in enumerate(task_data)
+])
+
 async def add_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
 user_id = update.effective_user.id
+
+# "/add Buy milk #personal\nCall dentist 30m" creates the tasks in one update
+parts = update.message.text.split(None, 1)
+if len(parts) > 1 and parts[1].strip():
+return await start_task_entry(update, context, parts[1])
+
 msg = get_text(user_id, 'add_tasks')
 await update.message.reply_text(msg, parse_mode='Markdown')
 return TASK_INPUT
 
 async def receive_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
+return await start_task_entry(update, context, update.message.text)
+
+async def start_task_entry(update: Update, context: ContextTypes.DEFAULT_TYPE, tasks_text):
+"""Create tasks from one message's lines, typed or read from a photo"""
 user_id = update.effective_user.id
-tasks_text = update.message.text
-tasks = [t.strip() for t in tasks_text.split('\n') if t.strip()]
+user_data = db.get_user(user_id)
+categories = user_data.categories
+
+# Tagged lines ("Call dentist #health 30m") are saved straight away;
+# only plain lines go through the category/recurring/time questions
+quick_tasks, tasks = parse_lines(tasks_text, categories)
+
+if quick_tasks:
+points, linked = save_task_data(user_id, quick_tasks)
+if not tasks:
+msg = get_text(user_id, 'all_set', summary=format_task_summary(quick_tasks, linked), points=points)
+await update.message.reply_text(msg, parse_mode='Markdown')
+return ConversationHandler.END
 
 context.user_data['pending_tasks'] = tasks
 context.user_data['current_task_index'] = 0
 context.user_data['task_data'] = []
 
-user_data = db.get_user(user_id)
-categories = user_data.get('categories', ['Work', 'Personal', 'Health'])
-
 keyboard = [[cat] for cat in categories] + [[get_text(user_id, 'skip_categories')]]
 
 msg = get_text(user_id, 'got_tasks', count=len(tasks), task=tasks[0])
+if quick_tasks:
+msg = get_text(user_id, 'quick_added', count=len(quick_tasks)) + msg
 
 await update.message.reply_text(
 msg,
@@ -507,14 +696,13 @@ index = context.user_data.get('current_task_index', 0)
 task_data = context.user_data['task_data'][-1]
 task_data['time'] = time_input
 task_data['completed'] = False
-task_data['created'] = datetime.now().isoformat()
 
 index += 1
 context.user_data['current_task_index'] = index
 
 if index < len(tasks):
 user_data = db.get_user(user_id)
-categories = user_data.get('categories', ['Work', 'Personal', 'Health'])
+categories = user_data.categories
 keyboard = [[cat] for cat in categories] + [[get_text(user_id, 'skip_categories')]]
 
 msg = get_text(user_id, 'next_task', num=index+1, task=tasks[index])
@@ -526,35 +714,173 @@ reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboa
 )
 return CATEGORY_SELECT
 else:
-user_data = db.get_user(user_id)
-for task in context.user_data['task_data']:
-if task.get('recurring'):
-user_data['recurring_tasks'].append(task)
-else:
-user_data['tasks'].append(task)
+points, linked = save_task_data(user_id, context.user_data['task_data'])
+summary = format_task_summary(context.user_data['task_data'], linked)
 
-points = len(tasks) * 5
-user_data['points'] += points
+msg = get_text(user_id, 'all_set', summary=summary, points=points)
 
-db.save_user(user_id, user_data)
+await update.message.reply_text(msg, parse_mode='Markdown')
+return ConversationHandler.END
 
-summary = "\n".join([
-f"{i+1}. [{t['category']}] {t['task']} - {t['time']}" +
-(f" ({t['recurring']})" if t.get('recurring') else "")
-for i, t in enumerate(context.user_data['task_data'])
-])
+async def receive_photo_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
+"""Read a photographed to-do list and add its lines as tasks"""
+user_id = update.effective_user.id
 
-msg = get_text(user_id, 'all_set', summary=summary, points=points)
+# Busy first, so a refused photo does not use up the user's allowance
+if ocr_pool.full:
+await update.message.reply_text(get_text(user_id, 'ocr_busy'))
+return ConversationHandler.END
+if not ocr_limiter.allow(user_id):
+await update.message.reply_text(get_text(user_id, 'ocr_rate_limited'))
+return ConversationHandler.END
 
-await update.message.reply_text(msg, parse_mode='Markdown')
+# The largest size Telegram offers
+photo_file = await update.message.photo[-1].get_file()
+data = bytes(await photo_file.download_as_bytearray())
+
+try:
+lines = await ocr_pool.submit(extract_lines, data)
+except PoolFull:
+await update.message.reply_text(get_text(user_id, 'ocr_busy'))
+return ConversationHandler.END
+except Exception:
+logger.exception(f"OCR failed for {user_id}")
+await update.message.reply_text(get_text(user_id, 'ocr_failed'))
+return ConversationHandler.END
+
+if not lines:
+await update.message.reply_text(get_text(user_id, 'ocr_nothing'))
+return ConversationHandler.END
+
+return await start_task_entry(update, context, "\n".join(lines))
+
+async def receive_voice_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
+"""Transcribe a voice note and add what was said as tasks"""
+user_id = update.effective_user.id
+voice = update.message.voice
+
+if voice.duration > MAX_VOICE_SECONDS:
+await update.message.reply_text(get_text(user_id, 'voice_too_long', seconds=MAX_VOICE_SECONDS))
+return ConversationHandler.END
+if voice_pipeline.full:
+await update.message.reply_text(get_text(user_id, 'voice_busy'))
+return ConversationHandler.END
+if not voice_limiter.allow(user_id):
+await update.message.reply_text(get_text(user_id, 'voice_rate_limited'))
+return ConversationHandler.END
+
+voice_file = await voice.get_file()
+data = bytes(await voice_file.download_as_bytearray())
+
+try:
+lines = await voice_pipeline.transcribe(data)
+except PoolFull:
+await update.message.reply_text(get_text(user_id, 'voice_busy'))
+return ConversationHandler.END
+except Exception:
+logger.exception(f"Voice transcription failed for {user_id}")
+await update.message.reply_text(get_text(user_id, 'voice_failed'))
+return ConversationHandler.END
+
+if not lines:
+await update.message.reply_text(get_text(user_id, 'voice_nothing'))
 return ConversationHandler.END
 
+return await start_task_entry(update, context, "\n".join(lines))
+
+def voice_handlers():
+return [MessageHandler(filters.VOICE, receive_voice_tasks, block=False)] if VOICE_ENABLED else []
+
+# ==================== TASK COMPLETION ====================
+
+# Telegram rejects inline keyboards with more than 100 buttons
+TASKS_PER_PAGE = 20
+
+def build_task_list(user_id, user_data, page=0):
+"""Task list text and one inline button per open task on the given page"""
+tasks = user_data.tasks
+if not tasks.open:
+return get_text(user_id, 'no_open_tasks'), None
+
+open_tasks = list(tasks.open.items())
+pages = math.ceil(len(open_tasks) / TASKS_PER_PAGE)
+page = min(page, pages - 1)
+start = page * TASKS_PER_PAGE
+keyboard = [
+[InlineKeyboardButton(f"⬜ {task.task}", callback_data=f"done_{task_id}_{page}")]
+for task_id, task in open_tasks[start:start + TASKS_PER_PAGE]
+]
+nav = []
+if page > 0:
+nav.append(InlineKeyboardButton(get_text(user_id, 'tasks_back'), callback_data=f"page_{page - 1}"))
+remaining = len(open_tasks) - start - TASKS_PER_PAGE
+if remaining > 0:
+nav.append(InlineKeyboardButton(get_text(user_id, 'tasks_more', count=remaining), callback_data=f"page_{page + 1}"))
+if nav:
+keyboard.append(nav)
+msg = get_text(user_id, 'tasks_title', done=len(tasks.done), total=len(tasks))
+return msg, InlineKeyboardMarkup(keyboard)
+
+async def tasks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+user_id = update.effective_user.id
+user_data = db.get_user(user_id)
+
+msg, keyboard = build_task_list(user_id, user_data)
+await update.message.reply_text(msg, parse_mode='Markdown', reply_markup=keyboard)
+
+async def task_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+query = update.callback_query
+user_id = query.from_user.id
+page = int(query.data.split('_')[1])
+await query.answer()
+
+msg, keyboard = build_task_list(user_id, db.get_user(user_id), page)
+await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=keyboard)
+
+async def task_done_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+query = update.callback_query
+user_id = query.from_user.id
+# done_<id>_<page>; lists sent before paging have no page
+_, task_id, *page = query.data.split('_')
+task_id = int(task_id)
+page = int(page[0]) if page else 0
+
+user_data = db.get_user(user_id)
+task = user_data.tasks.complete(task_id)
+if task is None:
+# Already completed from another message, or archived overnight
+await query.answer()
+return
+
+milestone = advance_goal(user_id, user_data, task)
+db.save_user(user_id, user_data)
+await query.answer(
+answer_text(get_text(user_id, 'task_completed', task=task.task) + milestone),
+show_alert=bool(milestone)
+)
+schedule_dashboard_refresh(context, user_id)
+
+msg, keyboard = build_task_list(user_id, user_data, page)
+await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=keyboard)
+
+async def archive_completed_tasks(context: ContextTypes.DEFAULT_TYPE):
+"""Nightly: move the day's completed tasks out of the hot task index"""
+archived = 0
+for chunk in db.iter_users():
+for user_id, user_data in chunk:
+if user_data.tasks.done:
+archived += len(user_data.archive_completed())
+db.save_user(user_id, user_data)
+# Let updates in between chunks
+await asyncio.sleep(0)
+logger.info(f"Archived {archived} completed tasks")
+
 # ==================== POMODORO TIMER ====================
 
 async def pomodoro_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 user_id = update.effective_user.id
 user_data = db.get_user(user_id)
-settings = user_data.get('pomodoro_settings', {'work': 25, 'break': 5, 'long_break': 15})
+settings = user_data.pomodoro_settings
 
 keyboard = [
 [InlineKeyboardButton(get_text(user_id, 'start_work'), callback_data="pomo_work")],
@@ -562,13 +888,13 @@ keyboard = [
 [InlineKeyboardButton(get_text(user_id, 'long_break_btn'), callback_data="pomo_long")]
 ]
 
-count = user_data.get('pomodoro_count', 0)
+count = user_data.pomodoro_count
 
 msg = get_text(user_id, 'pomodoro_title', 
 count=count, 
-work=settings['work'], 
-break_time=settings['break'], 
-long_break=settings['long_break'])
+work=settings.work, 
+break_time=settings.short_break, 
+long_break=settings.long_break)
 
 await update.message.reply_text(
 msg,
@@ -576,101 +902,286 @@ parse_mode='Markdown',
 reply_markup=InlineKeyboardMarkup(keyboard)
 )
 
+PHASE_STARTED = {WORK: 'work_started', SHORT_BREAK: 'break_time', LONG_BREAK: 'long_break'}
+PHASE_BUTTONS = {'work': WORK, 'break': SHORT_BREAK, 'long': LONG_BREAK}
+
+def render_pomodoro(user_id, session):
+"""Session message text and control buttons"""
+msg = get_text(user_id, PHASE_STARTED[session.phase], duration=session.duration(session.phase) // 60)
+left = math.ceil(session.seconds_left() / 60)
+if session.paused:
+msg += get_text(user_id, 'pomo_paused', left=left)
+elif session.live:
+msg += get_text(user_id, 'pomo_left', left=left)
+
+rows = [
+[(get_text(user_id, 'resume_btn'), 'pomo_resume') if session.paused else (get_text(user_id, 'pause_btn'), 'pomo_pause'),
+(get_text(user_id, 'stop_btn'), 'pomo_stop')],
+[(get_text(user_id, 'live_off_btn' if session.live else 'live_on_btn'), 'pomo_live')]
+]
+return msg, rows
+
+def cancel_phase_end(session):
+if session.job is not None:
+session.job.schedule_removal()
+session.job = None
+
+def schedule_phase_end(context: ContextTypes.DEFAULT_TYPE, session, delay):
+"""Replace the session's phase-end job; a user never has more than one"""
+cancel_phase_end(session)
+session.job = context.job_queue.run_once(
+pomodoro_complete,
+delay,
+data={'user_id': session.user_id},
+name=f'pomo_{session.user_id}'
+)
+
 async def pomodoro_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 query = update.callback_query
 await query.answer()
 
 user_id = query.from_user.id
-user_data = db.get_user(user_id)
-settings = user_data['pomodoro_settings']
+action = query.data.split('_', 1)[1]
 
-if query.data == "pomo_work":
-duration = settings['work']
-msg = get_text(user_id, 'work_started', duration=duration)
+if action in PHASE_BUTTONS:
+settings = db.get_user(user_id).pomodoro_settings
+session = pomodoros.start(user_id, query.message.chat_id, settings)
+schedule_phase_end(context, session, session.begin(PHASE_BUTTONS[action]))
+else:
+session = pomodoros.get(user_id)
+if session is None:
+await query.edit_message_text(get_text(user_id, 'pomo_no_session'))
+return
 
-context.job_queue.run_once(
-pomodoro_complete,
-duration * 60,
-data={'user_id': user_id, 'type': 'work'},
-name=f'pomo_{user_id}'
-)
+if action == 'stop':
+cancel_phase_end(session)
+pomodoros.end(user_id)
+await query.edit_message_text(get_text(user_id, 'pomo_stopped'))
+return
+elif action == 'pause':
+cancel_phase_end(session)
+session.pause()
+elif action == 'resume' and session.paused:
+schedule_phase_end(context, session, session.resume())
+elif action == 'live':
+pomodoros.set_live(session, not session.live)
+
+msg, rows = render_pomodoro(user_id, session)
+shown = digest(msg, rows)
+if session.message_id == query.message.message_id and session.shown == shown:
+# Repeated tap: nothing to change
+return
+
+session.message_id = query.message.message_id
+session.shown = shown
+await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=inline_markup(rows))
+
+async def pomodoro_complete(context: ContextTypes.DEFAULT_TYPE):
+user_id = context.job.data['user_id']
+session = pomodoros.get(user_id)
+if session is None or session.job is not context.job:
+# Stopped, or replaced by a newer phase
+return
+session.job = None
 
-user_data['pomodoro_count'] += 1
-user_data['points'] += 10
+if session.phase == WORK:
+# Only a finished work session counts
+session.cycle += 1
+user_data = db.get_user(user_id)
+user_data.pomodoro_count += 1
+user_data.points += 10
 db.save_user(user_id, user_data)
+schedule_dashboard_refresh(context, user_id)
+msg = get_text(user_id, 'work_complete')
+else:
+msg = get_text(user_id, 'break_over')
 
-elif query.data == "pomo_break":
-duration = settings['break']
-msg = get_text(user_id, 'break_time', duration=duration)
+next_phase = session.next_phase()
+if next_phase is None:
+pomodoros.end(user_id)
+await context.bot.send_message(chat_id=session.chat_id, text=msg, parse_mode='Markdown')
+return
 
-context.job_queue.run_once(
-pomodoro_complete,
-duration * 60,
-data={'user_id': user_id, 'type': 'break'},
-name=f'pomo_{user_id}'
+schedule_phase_end(context, session, session.begin(next_phase))
+text, rows = render_pomodoro(user_id, session)
+
+# A new message so the phase change notifies; it becomes the one the
+# countdown edits
+message = await context.bot.send_message(
+chat_id=session.chat_id,
+text=msg + "\n\n" + text,
+parse_mode='Markdown',
+reply_markup=inline_markup(rows)
+)
+session.message_id = message.message_id
+session.shown = digest(msg + "\n\n" + text, rows)
+
+async def pomodoro_countdown_tick(context: ContextTypes.DEFAULT_TYPE):
+"""Edit due live countdowns, staying within the shared edit budget"""
+for session in pomodoros.due_countdowns(EDIT_BUDGET * POMODORO_TICK):
+text, rows = render_pomodoro(session.user_id, session)
+shown = digest(text, rows)
+if shown == session.shown:
+# The minute shown hasn't changed
+continue
+session.shown = shown
+try:
+await context.bot.edit_message_text(
+text,
+chat_id=session.chat_id,
+message_id=session.message_id,
+parse_mode='Markdown',
+reply_markup=inline_markup(rows)
 )
+except BadRequest as e:
+logger.info(f"Stopping countdown for {session.user_id}: {e}")
+pomodoros.set_live(session, False)
+
+# ==================== DASHBOARDS ====================
+
+def inline_markup(rows):
+if not rows:
+return None
+return InlineKeyboardMarkup([
+[InlineKeyboardButton(label, callback_data=data) for label, data in row]
+for row in rows
+])
 
-elif query.data == "pomo_long":
-duration = settings['long_break']
-msg = get_text(user_id, 'long_break', duration=duration)
+async def send_dashboard(update: Update, user_id, kind, text, rows):
+"""Post a dashboard message; later taps edit it instead of replying"""
+message = await update.message.reply_text(text, parse_mode='Markdown', reply_markup=inline_markup(rows))
+dashboards.register(user_id, kind, message.chat_id, message.message_id, text, rows)
 
+def schedule_dashboard_refresh(context: ContextTypes.DEFAULT_TYPE, user_id):
+"""Refresh the user's dashboards once, after a burst of taps settles"""
+if dashboards.request_refresh(user_id):
 context.job_queue.run_once(
-pomodoro_complete,
-duration * 60,
-data={'user_id': user_id, 'type': 'long_break'},
-name=f'pomo_{user_id}'
+refresh_dashboards,
+dashboards.delay,
+data={'user_id': user_id},
+name=f'dash_{user_id}'
 )
 
-await query.edit_message_text(msg, parse_mode='Markdown')
+async def refresh_dashboards(context: ContextTypes.DEFAULT_TYPE):
+user_id = context.job.data['user_id']
+dashboards.refresh_started(user_id)
+user_data = db.get_user(user_id)
 
-async def pomodoro_complete(context: ContextTypes.DEFAULT_TYPE):
-job = context.job
-user_id = job.data['user_id']
-session_type = job.data['type']
+for kind, chat_id, message_id in dashboards.dashboards(user_id):
+text, rows = DASHBOARD_RENDERERS[kind](user_id, user_data)
+if not dashboards.changed(chat_id, message_id, text, rows):
+continue
+try:
+await context.bot.edit_message_text(
+text,
+chat_id=chat_id,
+message_id=message_id,
+parse_mode='Markdown',
+reply_markup=inline_markup(rows)
+)
+except BadRequest as e:
+# Deleted or too old to edit: stop tracking it
+logger.info(f"Dropping {kind} dashboard for {user_id}: {e}")
+dashboards.forget(user_id, kind)
 
-if session_type == 'work':
-msg = get_text(user_id, 'work_complete')
-else:
-msg = get_text(user_id, 'break_over')
+async def dashboard_refresh_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+query = update.callback_query
+await query.answer()
 
-await context.bot.send_message(chat_id=user_id, text=msg, parse_mode='Markdown')
+user_id = query.from_user.id
+kind = query.data.split('_', 1)[1]
+dashboards.register(user_id, kind, query.message.chat_id, query.message.message_id)
+
+text, rows = DASHBOARD_RENDERERS[kind](user_id, db.get_user(user_id))
+if dashboards.changed(query.message.chat_id, query.message.message_id, text, rows):
+await query.edit_message_text(text, parse_mode='Markdown', reply_markup=inline_markup(rows))
 
 # ==================== HABITS & STREAKS ====================
 
+def render_habits(user_id, user_data):
+habits = user_data.habits
+today = today_epoch_day()
+
+habit_list = []
+rows = []
+for i, habit in enumerate(habits):
+status = "✅" if habit.done_on(today) else "⬜"
+habit_list.append(f"{status} {habit.habit} - 🔥{habit.streak} (best: {habit.best_streak})")
+rows.append([(f"{status} {habit.habit}", f"habit_{i}")])
+
+all_done = all(h.done_on(today) for h in habits)
+msg = get_text(user_id, 'daily_habits') + "\n".join(habit_list) + "\n\n" + (
+get_text(user_id, 'all_done_habits') if all_done else get_text(user_id, 'tap_to_check')
+)
+return msg, rows
+
+def check_habit(user_id, user_data, habit):
+"""Check a habit off for today
+
+Returns (confirmation, milestone) where milestone says whether a streak
+or goal milestone was reached, or None if the habit was already done.
+"""
+today = today_epoch_day()
+if habit.done_on(today):
+return None
+
+habit.tracking.append(today)
+habit.streak += 1
+
+if habit.streak > habit.best_streak:
+habit.best_streak = habit.streak
+
+points = 5 + (habit.streak // 7) * 5
+user_data.points += points
+
+if habit.streak == 7:
+user_data.achievements.append(f"🏆 Week Warrior - {habit.habit}")
+elif habit.streak == 30:
+user_data.achievements.append(f"👑 Month Master - {habit.habit}")
+
+goal_milestone = advance_goal(user_id, user_data, habit)
+db.save_user(user_id, user_data)
+
+msg = get_text(user_id, 'habit_checked', habit=habit.habit, streak=habit.streak, points=points)
+
+streak_milestone = habit.streak % 7 == 0
+if streak_milestone:
+msg += get_text(user_id, 'milestone', streak=habit.streak)
+return msg + goal_milestone, streak_milestone or bool(goal_milestone)
+
 async def habits_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 user_id = update.effective_user.id
 user_data = db.get_user(user_id)
-habits = user_data.get('habits', [])
 
-if not habits:
+if not user_data.habits:
 msg = get_text(user_id, 'no_habits')
 await update.message.reply_text(msg)
 return
 
-today = datetime.now().date().isoformat()
+text, rows = render_habits(user_id, user_data)
+await send_dashboard(update, user_id, 'habits', text, rows)
 
-habit_list = []
-for i, habit in enumerate(habits):
-streak = habit.get('streak', 0)
-best = habit.get('best_streak', 0)
-done_today = today in habit.get('tracking', [])
-
-status = "✅" if done_today else "⬜"
-habit_list.append(f"{status} {habit['habit']} - 🔥{streak} (best: {best})")
+async def habit_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+query = update.callback_query
+user_id = query.from_user.id
+index = int(query.data.split('_')[1])
 
-keyboard = [[h['habit']] for h in habits if today not in h.get('tracking', [])]
-if keyboard:
-keyboard.append([get_text(user_id, 'all_done')])
+user_data = db.get_user(user_id)
+if index >= len(user_data.habits):
+await query.answer()
+return
 
-msg = get_text(user_id, 'daily_habits') + "\n".join(habit_list) + "\n\n" + (
-get_text(user_id, 'tap_to_check') if keyboard else get_text(user_id, 'all_done_habits')
-)
+checked = check_habit(user_id, user_data, user_data.habits[index])
+if checked is None:
+await query.answer(get_text(user_id, 'habit_already_done'))
+return
+msg, milestone = checked
 
-await update.message.reply_text(
-msg,
-parse_mode='Markdown',
-reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True) if keyboard else None
-)
+# The confirmation rides on the callback answer, which Telegram requires
+# anyway; the dashboard itself is edited once the taps settle
+await query.answer(answer_text(msg), show_alert=milestone)
+dashboards.register(user_id, 'habits', query.message.chat_id, query.message.message_id)
+schedule_dashboard_refresh(context, user_id)
 
 async def habit_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
 user_id = update.effective_user.id
@@ -682,59 +1193,118 @@ await update.message.reply_text(get_text(user_id, 'all_done_habits'))
 return
 
 user_data = db.get_user(user_id)
-today = datetime.now().date().isoformat()
-
-for habit in user_data['habits']:
-if habit['habit'] == habit_name:
-if today not in habit['tracking']:
-habit['tracking'].append(today)
-habit['streak'] = habit.get('streak', 0) + 1
 
-if habit['streak'] > habit.get('best_streak', 0):
-habit['best_streak'] = habit['streak']
+for habit in user_data.habits:
+if habit.habit == habit_name:
+checked = check_habit(user_id, user_data, habit)
+if checked is not None:
+await update.message.reply_text(checked[0], parse_mode='Markdown')
+schedule_dashboard_refresh(context, user_id)
+break
 
-points = 5 + (habit['streak'] // 7) * 5
-user_data['points'] += points
+# ==================== GOALS ====================
 
-if habit['streak'] == 7:
-user_data['achievements'].append(f"🏆 Week Warrior - {habit_name}")
-elif habit['streak'] == 30:
-user_data['achievements'].append(f"👑 Month Master - {habit_name}")
+def advance_goal(user_id, user_data, item):
+"""Credit a completed task or checked habit to its goal; returns any milestone note"""
+goal = user_data.goal_of(item)
+if goal is None:
+return ""
+reached = goal.advance()
+if not reached:
+return ""
+# A big jump can pass several milestones at once; announce the highest
+return get_text(user_id, 'goal_milestone', goal=goal.goal, percent=reached[-1])
 
-db.save_user(user_id, user_data)
+def progress_bar(percent, width=10):
+filled = percent * width // 100
+return "▓" * filled + "░" * (width - filled)
 
-msg = get_text(user_id, 'habit_checked', habit=habit_name, streak=habit['streak'], points=points)
+async def goals_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+user_id = update.effective_user.id
+user_data = db.get_user(user_id)
 
-if habit['streak'] % 7 == 0:
-msg += get_text(user_id, 'milestone', streak=habit['streak'])
+if not user_data.monthly_goals:
+await update.message.reply_text(get_text(user_id, 'no_goals'))
+return
 
+# Progress is kept current as linked work is done; nothing is recounted here
+msg = get_text(user_id, 'goals_title')
+for i, goal in enumerate(user_data.monthly_goals):
+msg += get_text(user_id, 'goal_line', index=i + 1, goal=escape(goal.goal), bar=progress_bar(goal.progress),
+progress=goal.progress, done=goal.done, target=goal.target)
+msg += get_text(user_id, 'goals_hint')
 await update.message.reply_text(msg, parse_mode='Markdown')
-break
-
-# ==================== STATUS & REPORTS ====================
 
-async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def link_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+"""/link <habit> <goal>: count a habit's check-ins toward a goal"""
 user_id = update.effective_user.id
 user_data = db.get_user(user_id)
 
-tasks = user_data.get('tasks', [])
-completed = [t for t in tasks if t.get('completed')]
-habits = user_data.get('habits', [])
-today = datetime.now().date().isoformat()
-habits_done = sum(1 for h in habits if today in h.get('tracking', []))
+if not user_data.monthly_goals:
+await update.message.reply_text(get_text(user_id, 'no_goals'))
+return
+
+args = context.args
+if (len(args) != 2 or not all(a.isdigit() for a in args)
+or not 1 <= int(args[0]) <= len(user_data.habits)
+or not 1 <= int(args[1]) <= len(user_data.monthly_goals)):
+habits = "\n".join(f"{i+1}. {escape(h.habit)}" for i, h in enumerate(user_data.habits))
+goals = "\n".join(f"{i+1}. {escape(g.goal)}" for i, g in enumerate(user_data.monthly_goals))
+await update.message.reply_text(
+get_text(user_id, 'link_usage', habits=habits or "-", goals=goals),
+parse_mode='Markdown'
+)
+return
+
+habit = user_data.habits[int(args[0]) - 1]
+goal_index = int(args[1]) - 1
+if not user_data.link_habit(habit, goal_index):
+await update.message.reply_text(
+get_text(user_id, 'habit_already_linked', habit=escape(habit.habit), goal=escape(user_data.goal_of(habit).goal)),
+parse_mode='Markdown'
+)
+return
+db.save_user(user_id, user_data)
+
+await update.message.reply_text(
+get_text(user_id, 'habit_linked', habit=escape(habit.habit), goal=escape(user_data.monthly_goals[goal_index].goal)),
+parse_mode='Markdown'
+)
+
+# ==================== STATUS & REPORTS ====================
+
+def render_status(user_id, user_data):
+# Counts come straight from the task index; nothing is scanned
+tasks_done = len(user_data.tasks.done)
+tasks_total = len(user_data.tasks)
+habits = user_data.habits
+today = today_epoch_day()
+habits_done = sum(1 for h in habits if h.done_on(today))
 
 status_text = get_text(user_id, 'status_title')
-status_text += get_text(user_id, 'status_tasks', completed=len(completed), total=len(tasks))
+status_text += get_text(user_id, 'status_tasks', completed=tasks_done, total=tasks_total)
 status_text += get_text(user_id, 'status_habits', done=habits_done, total=len(habits))
-status_text += get_text(user_id, 'status_pomodoros', count=user_data.get('pomodoro_count', 0))
-status_text += get_text(user_id, 'status_points', points=user_data.get('points', 0))
+status_text += get_text(user_id, 'status_pomodoros', count=user_data.pomodoro_count)
+status_text += get_text(user_id, 'status_points', points=user_data.points)
 
-if len(completed) == len(tasks) and habits_done == len(habits):
+if tasks_done == tasks_total and habits_done == len(habits):
 status_text += get_text(user_id, 'great_day')
 else:
 status_text += get_text(user_id, 'keep_going')
 
-await update.message.reply_text(status_text, parse_mode='Markdown')
+return status_text, [[(get_text(user_id, 'refresh_btn'), 'dash_status')]]
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+user_id = update.effective_user.id
+user_data = db.get_user(user_id)
+
+text, rows = render_status(user_id, user_data)
+await send_dashboard(update, user_id, 'status', text, rows)
+
+DASHBOARD_RENDERERS = {
+'habits': render_habits,
+'status': render_status,
+}
 
 async def export_pdf(update: Update, context: ContextTypes.DEFAULT_TYPE):
 user_id = update.effective_user.id
@@ -760,20 +1330,20 @@ doc = SimpleDocTemplate(filename, pagesize=letter)
 styles = getSampleStyleSheet()
 story = []
 
-lang = user_data.get('language', 'en')
+lang = user_data.language
 
 title_text = "Productivity Report" if lang == 'en' else "تقرير الإنتاجية"
 title = Paragraph(f"<b>{title_text} - {datetime.now().strftime('%B %Y')}</b>", styles['Title'])
 story.append(title)
 
-goals = user_data.get('monthly_goals', [])
+goals = user_data.monthly_goals
 if goals:
 goals_title = "Monthly Goals" if lang == 'en' else "الأهداف الشهرية"
 story.append(Paragraph(f"<br/><b>{goals_title}</b>", styles['Heading2']))
 goal_header = ['Goal', 'Progress'] if lang == 'en' else ['الهدف', 'التقدم']
 goal_data = [goal_header]
 for g in goals:
-goal_data.append([g['goal'], f"{g['progress']}%"])
+goal_data.append([g.goal, f"{g.progress}%"])
 
 goal_table = Table(goal_data)
 goal_table.setStyle(TableStyle([
@@ -785,14 +1355,14 @@ goal_table.setStyle(TableStyle([
 ]))
 story.append(goal_table)
 
-habits = user_data.get('habits', [])
+habits = user_data.habits
 if habits:
 habits_title = "Habit Streaks" if lang == 'en' else "سلاسل العادات"
 story.append(Paragraph(f"<br/><b>{habits_title}</b>", styles['Heading2']))
 habit_header = ['Habit', 'Current Streak', 'Best Streak'] if lang == 'en' else ['العادة', 'السلسلة الحالية', 'أفضل سلسلة']
 habit_data = [habit_header]
 for h in habits:
-habit_data.append([h['habit'], str(h.get('streak', 0)), str(h.get('best_streak', 0))])
+habit_data.append([h.habit, str(h.streak), str(h.best_streak)])
 
 habit_table = Table(habit_data)
 habit_table.setStyle(TableStyle([
@@ -811,9 +1381,9 @@ points_label = "Total Points" if lang == 'en' else "إجمالي النقاط"
 pomo_label = "Pomodoros" if lang == 'en' else "بومودورو"
 achieve_label = "Achievements" if lang == 'en' else "الإنجازات"
 
-story.append(Paragraph(f"{points_label}: {user_data.get('points', 0)}", styles['Normal']))
-story.append(Paragraph(f"{pomo_label}: {user_data.get('pomodoro_count', 0)}", styles['Normal']))
-story.append(Paragraph(f"{achieve_label}: {len(user_data.get('achievements', []))}", styles['Normal']))
+story.append(Paragraph(f"{points_label}: {user_data.points}", styles['Normal']))
+story.append(Paragraph(f"{pomo_label}: {user_data.pomodoro_count}", styles['Normal']))
+story.append(Paragraph(f"{achieve_label}: {len(user_data.achievements)}", styles['Normal']))
 
 doc.build(story)
 
@@ -829,6 +1399,127 @@ help_text += get_text(user_id, 'help_tip')
 
 await update.message.reply_text(help_text, parse_mode='Markdown')
 
+# ==================== DAILY DIGEST ====================
+
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+user_id = update.effective_user.id
+user_data = db.get_user(user_id)
+
+user_data.digest = not user_data.digest
+db.save_user(user_id, user_data)
+
+await update.message.reply_text(get_text(user_id, 'digest_enabled' if user_data.digest else 'digest_disabled'))
+
+async def send_digest(context: ContextTypes.DEFAULT_TYPE):
+"""Morning digest or evening review for every subscribed user"""
+render = context.job.data['render']
+
+def render_user(user_id, user_data):
+if not user_data.digest:
+return None
+return render(user_data, TRANSLATIONS[user_data.language])
+
+async def send(user_id, text):
+await context.bot.send_message(chat_id=user_id, text=text, parse_mode='Markdown')
+
+sent, failed = await run_digest(db.iter_users(), render_user, send, db.count_users(), DIGEST_WINDOW)
+logger.info(f"{context.job.name}: sent {sent}, failed {failed}")
+
+# ==================== DATA EXPORT ====================
+
+async def mydata_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+"""Everything stored about the user (and their team) as one JSON file"""
+user_id = update.effective_user.id
+user_data = db.get_user(user_id)
+
+records = [{'type': 'user', 'id': user_id, 'data': user_data.to_dict()}]
+if user_data.team_id is not None:
+records.append({'type': 'team', 'id': user_data.team_id, 'data': db.get_team(user_data.team_id)})
+body = json.dumps(records, ensure_ascii=False, indent=2)
+
+await update.message.reply_document(
+document=io.BytesIO(body.encode('utf-8')),
+filename=f"my_data_{datetime.now().strftime('%Y%m%d')}.json",
+caption=get_text(user_id, 'mydata_caption')
+)
+
+async def exportall_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+"""Every user and team as a compressed file: /exportall [ndjson|csv]
+
+The file loads into another backend with `python transfer.py import`.
+"""
+user_id = update.effective_user.id
+if user_id not in ADMIN_IDS:
+return
+
+args = context.args or []
+fmt = args[0] if args and args[0] in FORMATS else 'ndjson'
+await update.message.reply_text(f"📦 Exporting {db.count_users()} users ({fmt})...")
+
+path = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}.gz"
+try:
+# Streams one chunk of users at a time, off the event loop
+count = await asyncio.to_thread(export_to_file, db, path, fmt)
+with open(path, 'rb') as f:
+await update.message.reply_document(document=f, filename=path, caption=f"📦 {count} records")
+finally:
+if os.path.exists(path):
+os.remove(path)
+
+# ==================== ADMIN: PROFILING ====================
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+"""Sample the running bot for N seconds: /profile [seconds] [top|collapsed]"""
+user_id = update.effective_user.id
+if user_id not in ADMIN_IDS:
+return
+
+if context.bot_data.get('profiler') is not None:
+await update.message.reply_text("⏱️ A profiling session is already running.")
+return
+
+args = context.args or []
+try:
+seconds = max(1, min(int(args[0]), PROFILE_MAX_SECONDS)) if args else 30
+except ValueError:
+seconds = 30
+mode = 'collapsed' if len(args) > 1 and args[1] == 'collapsed' else 'top'
+
+# Handlers run on the event loop thread, which is the one we sample
+profiler = SamplingProfiler(application_callbacks(context.application))
+profiler.start()
+context.bot_data['profiler'] = profiler
+
+context.job_queue.run_once(
+profile_complete,
+seconds,
+data={'chat_id': update.effective_chat.id, 'mode': mode},
+name='profiler'
+)
+
+await update.message.reply_text(f"⏱️ Profiling for {seconds}s ({mode})...")
+
+async def profile_complete(context: ContextTypes.DEFAULT_TYPE):
+job = context.job
+profiler = context.bot_data.pop('profiler', None)
+if profiler is None:
+return
+profiler.stop()
+
+if job.data['mode'] == 'collapsed':
+body = profiler.collapsed()
+filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded"
+else:
+body = profiler.summary()
+filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+
+await context.bot.send_document(
+chat_id=job.data['chat_id'],
+document=io.BytesIO(body.encode('utf-8')),
+filename=filename,
+caption=f"⏱️ {profiler.samples} samples over {profiler.elapsed:.0f}s"
+)
+
 # ==================== MAIN ====================
 
 def main():
@@ -840,6 +1531,9 @@ if not BOT_TOKEN:
 logger.error("TELEGRAM_BOT_TOKEN not found in environment variables!")
 return
 
+if not VOICE_ENABLED:
+logger.warning("Vosk model not found at VOSK_MODEL_PATH; voice notes are disabled")
+
 # Check if we are running on Render (i.e., APP_NAME is set)
 if APP_NAME:
 # --- WEBHOOK MODE FOR RENDER ---
@@ -849,6 +1543,10 @@ logger.info(f"🚀 Starting webhook for app {APP_NAME} on port {PORT}")
 
 application = Application.builder().token(BOT_TOKEN).build()
 application.job_queue.start() # <--- ADD THIS LINE
+application.job_queue.run_daily(archive_completed_tasks, time=dt_time(0, 0), name='archive_tasks')
+application.job_queue.run_repeating(pomodoro_countdown_tick, interval=POMODORO_TICK, name='pomodoro_countdown')
+application.job_queue.run_daily(send_digest, time=DIGEST_MORNING, data={'render': render_morning}, name='morning_digest')
+application.job_queue.run_daily(send_digest, time=DIGEST_EVENING, data={'render': render_evening}, name='evening_review')
 
 setup_conv = ConversationHandler(
 entry_points=[CommandHandler('start', start)],
@@ -861,9 +1559,18 @@ fallbacks=[CommandHandler('start', start)]
 )
 
 task_conv = ConversationHandler(
-entry_points=[CommandHandler('add', add_tasks)],
+entry_points=[
+CommandHandler('add', add_tasks),
+# Non-blocking so other updates keep flowing while OCR / speech-to-text runs
+MessageHandler(filters.PHOTO, receive_photo_tasks, block=False),
+*voice_handlers()
+],
 states={
-TASK_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_tasks)],
+TASK_INPUT: [
+MessageHandler(filters.TEXT & ~filters.COMMAND, receive_tasks),
+MessageHandler(filters.PHOTO, receive_photo_tasks, block=False),
+*voice_handlers()
+],
 CATEGORY_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_category)],
 RECURRING_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_recurring)],
 TIME_ALLOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, allocate_time)],
@@ -871,17 +1578,27 @@ TIME_ALLOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, allocate_time)
 fallbacks=[CommandHandler('add', add_tasks)]
 )
 
-# --- PASTE YOUR 11 application.add_handler(...) LINES HERE ---
-# (application.add_handler(setup_conv)
+application.add_handler(setup_conv)
 application.add_handler(task_conv)
 application.add_handler(CommandHandler('language', language_command))
 application.add_handler(CommandHandler('pomodoro', pomodoro_command))
 application.add_handler(CommandHandler('habits', habits_command))
 application.add_handler(CommandHandler('status', status_command))
+application.add_handler(CommandHandler('tasks', tasks_command))
+application.add_handler(CommandHandler('digest', digest_command))
+application.add_handler(CommandHandler('goals', goals_command))
+application.add_handler(CommandHandler('link', link_command))
 application.add_handler(CommandHandler('export', export_pdf))
+application.add_handler(CommandHandler('mydata', mydata_command))
 application.add_handler(CommandHandler('help', help_command))
+application.add_handler(CommandHandler('profile', profile_command))
+application.add_handler(CommandHandler('exportall', exportall_command))
 application.add_handler(CallbackQueryHandler(language_callback, pattern='^lang_(en|ar)'))
 application.add_handler(CallbackQueryHandler(pomodoro_callback, pattern='^pomo_'))
+application.add_handler(CallbackQueryHandler(task_done_callback, pattern=r'^done_\d+(_\d+)?$'))
+application.add_handler(CallbackQueryHandler(task_page_callback, pattern=r'^page_\d+$'))
+application.add_handler(CallbackQueryHandler(habit_callback, pattern=r'^habit_\d+$'))
+application.add_handler(CallbackQueryHandler(dashboard_refresh_callback, pattern='^dash_(habits|status)$'))
 application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, habit_check))
 
 # Start the web server
@@ -897,6 +1614,10 @@ logger.info("🚀 Starting polling mode for local testing...")
 
 application = Application.builder().token(BOT_TOKEN).build()
 application.job_queue.start() # <--- ADD THIS LINE
+application.job_queue.run_daily(archive_completed_tasks, time=dt_time(0, 0), name='archive_tasks')
+application.job_queue.run_repeating(pomodoro_countdown_tick, interval=POMODORO_TICK, name='pomodoro_countdown')
+application.job_queue.run_daily(send_digest, time=DIGEST_MORNING, data={'render': render_morning}, name='morning_digest')
+application.job_queue.run_daily(send_digest, time=DIGEST_EVENING, data={'render': render_evening}, name='evening_review')
 
 setup_conv = ConversationHandler(
 entry_points=[CommandHandler('start', start)],
@@ -908,9 +1629,18 @@ HABITS_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_habits)],
 fallbacks=[CommandHandler('start', start)]
 )
 task_conv = ConversationHandler(
-entry_points=[CommandHandler('add', add_tasks)],
+entry_points=[
+CommandHandler('add', add_tasks),
+# Non-blocking so other updates keep flowing while OCR / speech-to-text runs
+MessageHandler(filters.PHOTO, receive_photo_tasks, block=False),
+*voice_handlers()
+],
 states={
-TASK_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_tasks)],
+TASK_INPUT: [
+MessageHandler(filters.TEXT & ~filters.COMMAND, receive_tasks),
+MessageHandler(filters.PHOTO, receive_photo_tasks, block=False),
+*voice_handlers()
+],
 CATEGORY_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_category)],
 RECURRING_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_recurring)],
 TIME_ALLOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, allocate_time)],
@@ -918,17 +1648,27 @@ TIME_ALLOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, allocate_time)
 fallbacks=[CommandHandler('add', add_tasks)]
 )
 
-# --- PASTE YOUR 11 application.add_handler(...) LINES HERE ---
-# (application.add_handler(setup_conv)
+application.add_handler(setup_conv)
 application.add_handler(task_conv)
 application.add_handler(CommandHandler('language', language_command))
 application.add_handler(CommandHandler('pomodoro', pomodoro_command))
 application.add_handler(CommandHandler('habits', habits_command))
 application.add_handler(CommandHandler('status', status_command))
+application.add_handler(CommandHandler('tasks', tasks_command))
+application.add_handler(CommandHandler('digest', digest_command))
+application.add_handler(CommandHandler('goals', goals_command))
+application.add_handler(CommandHandler('link', link_command))
 application.add_handler(CommandHandler('export', export_pdf))
+application.add_handler(CommandHandler('mydata', mydata_command))
 application.add_handler(CommandHandler('help', help_command))
+application.add_handler(CommandHandler('profile', profile_command))
+application.add_handler(CommandHandler('exportall', exportall_command))
 application.add_handler(CallbackQueryHandler(language_callback, pattern='^lang_(en|ar)'))
 application.add_handler(CallbackQueryHandler(pomodoro_callback, pattern='^pomo_'))
+application.add_handler(CallbackQueryHandler(task_done_callback, pattern=r'^done_\d+(_\d+)?$'))
+application.add_handler(CallbackQueryHandler(task_page_callback, pattern=r'^page_\d+$'))
+application.add_handler(CallbackQueryHandler(habit_callback, pattern=r'^habit_\d+$'))
+application.add_handler(CallbackQueryHandler(dashboard_refresh_callback, pattern='^dash_(habits|status)$'))
 application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, habit_check))
 
 application.run_polling(poll_interval=1.0)
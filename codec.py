@@ -0,0 +1,464 @@
+import json
+import struct
+import sys
+from array import array
+from functools import partial
+
+from models import User, Habit, Task, TaskIndex, Goal, PomodoroSettings, Deferred, intern
+
+# ==================== BINARY RECORD FORMAT ====================
+#
+# Users and teams are stored as compact little-endian binary records:
+#
+#   magic (2 bytes) | schema version (u8) | body
+#
+# Strings are u32-length-prefixed UTF-8. Free-form values (team members,
+# achievements, habit_streaks, ...) use a small msgpack-style tagged
+# encoding. The two collections that only grow -- each habit's tracking
+# days and the completed task archive -- are length-prefixed blobs that
+# decode lazily, so reading a user for /status never touches them.
+#
+# Records without a magic prefix are version 0: the JSON dict layout used
+# before this format existed. Older records are upgraded on read by running
+# the *_MIGRATIONS chain up to the current *_SCHEMA_VERSION.
+#
+# User schema history:
+#   1  first binary layout
+#   2  task ids and completion times, next_task_id on the user
+#   3  flags byte on the user (bit 0: daily digest enabled)
+#   4  goal links on tasks and habits, target/done counters on goals
+
+USER_MAGIC = b'PU'
+TEAM_MAGIC = b'PT'
+USER_SCHEMA_VERSION = 4
+TEAM_SCHEMA_VERSION = 1
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_HEADER = struct.Struct('<2sB')
+_USER_FIXED_V1 = struct.Struct('<qIHHH')
+_USER_FIXED_V2 = struct.Struct('<qIHHHI')
+_USER_FIXED = struct.Struct('<qIHHHIB')
+
+_FLAG_DIGEST = 0x01
+_HABIT_FIXED_V1 = struct.Struct('<II')
+_HABIT_FIXED = struct.Struct('<IIB')
+_TASK_FIXED_V1 = struct.Struct('<Bq')
+_TASK_FIXED_V2 = struct.Struct('<IBqq')
+_TASK_FIXED = struct.Struct('<IBqqB')
+_GOAL_FIXED_V1 = struct.Struct('<qH')
+_GOAL_FIXED = struct.Struct('<qHII')
+
+_NONE_LEN = 0xFFFFFFFF
+
+
+class RecordError(ValueError):
+    pass
+
+
+# ---------- primitives ----------
+
+def _write_str(buf, value):
+    if value is None:
+        buf += _U32.pack(_NONE_LEN)
+        return
+    data = value.encode('utf-8')
+    buf += _U32.pack(len(data))
+    buf += data
+
+
+def _read_str(view, pos):
+    (length,) = _U32.unpack_from(view, pos)
+    pos += 4
+    if length == _NONE_LEN:
+        return None, pos
+    return str(view[pos:pos + length], 'utf-8'), pos + length
+
+
+def _write_blob(buf, data):
+    buf += _U32.pack(len(data))
+    buf += data
+
+
+def _read_blob(view, pos):
+    (length,) = _U32.unpack_from(view, pos)
+    pos += 4
+    return view[pos:pos + length], pos + length
+
+
+def _pack_value(buf, value):
+    """msgpack-style tagged encoding for free-form values"""
+    if value is None:
+        buf += b'N'
+    elif value is True:
+        buf += b'T'
+    elif value is False:
+        buf += b'F'
+    elif isinstance(value, int):
+        buf += b'i'
+        buf += _I64.pack(value)
+    elif isinstance(value, float):
+        buf += b'd'
+        buf += _F64.pack(value)
+    elif isinstance(value, str):
+        buf += b's'
+        _write_str(buf, value)
+    elif isinstance(value, (list, tuple)):
+        buf += b'l'
+        buf += _U32.pack(len(value))
+        for item in value:
+            _pack_value(buf, item)
+    elif isinstance(value, dict):
+        buf += b'm'
+        buf += _U32.pack(len(value))
+        for key, item in value.items():
+            _pack_value(buf, key)
+            _pack_value(buf, item)
+    else:
+        raise RecordError(f"cannot encode {type(value).__name__}")
+
+
+def _unpack_value(view, pos):
+    tag = view[pos]
+    pos += 1
+    if tag == 0x4E:  # N
+        return None, pos
+    if tag == 0x54:  # T
+        return True, pos
+    if tag == 0x46:  # F
+        return False, pos
+    if tag == 0x69:  # i
+        return _I64.unpack_from(view, pos)[0], pos + 8
+    if tag == 0x64:  # d
+        return _F64.unpack_from(view, pos)[0], pos + 8
+    if tag == 0x73:  # s
+        return _read_str(view, pos)
+    if tag == 0x6C:  # l
+        (count,) = _U32.unpack_from(view, pos)
+        pos += 4
+        items = []
+        for _ in range(count):
+            item, pos = _unpack_value(view, pos)
+            items.append(item)
+        return items, pos
+    if tag == 0x6D:  # m
+        (count,) = _U32.unpack_from(view, pos)
+        pos += 4
+        mapping = {}
+        for _ in range(count):
+            key, pos = _unpack_value(view, pos)
+            mapping[key], pos = _unpack_value(view, pos)
+        return mapping, pos
+    raise RecordError(f"unknown value tag {tag:#x}")
+
+
+# ---------- sub-records ----------
+
+def _pack_goal(index):
+    # Goal links are stored one-based so 0 can mean "not linked"
+    return 0 if index is None else index + 1
+
+
+def _unpack_goal(value):
+    return value - 1 if value else None
+
+
+def _write_task(buf, task):
+    _write_str(buf, task.task)
+    _write_str(buf, task.category)
+    _write_str(buf, task.recurring)
+    _write_str(buf, task.time)
+    # Recurring templates have no id; 0 and a completed_at of 0 mean None
+    buf += _TASK_FIXED.pack(task.id or 0, 1 if task.completed else 0, task.created,
+                            task.completed_at or 0, _pack_goal(task.goal))
+
+
+def _read_task(view, pos, version=USER_SCHEMA_VERSION):
+    text, pos = _read_str(view, pos)
+    category, pos = _read_str(view, pos)
+    recurring, pos = _read_str(view, pos)
+    time, pos = _read_str(view, pos)
+    if version == 1:
+        completed, created = _TASK_FIXED_V1.unpack_from(view, pos)
+        return Task(text, category, recurring, time, bool(completed), created), pos + _TASK_FIXED_V1.size
+    if version < 4:
+        task_id, completed, created, completed_at = _TASK_FIXED_V2.unpack_from(view, pos)
+        task = Task(text, category, recurring, time, bool(completed), created, task_id or None, completed_at or None)
+        return task, pos + _TASK_FIXED_V2.size
+    task_id, completed, created, completed_at, goal = _TASK_FIXED.unpack_from(view, pos)
+    task = Task(text, category, recurring, time, bool(completed), created,
+                task_id or None, completed_at or None, _unpack_goal(goal))
+    return task, pos + _TASK_FIXED.size
+
+
+def _write_tasks(buf, tasks):
+    buf += _U32.pack(len(tasks))
+    for task in tasks:
+        _write_task(buf, task)
+
+
+def _read_tasks(view, pos, version=USER_SCHEMA_VERSION):
+    (count,) = _U32.unpack_from(view, pos)
+    pos += 4
+    tasks = []
+    for _ in range(count):
+        task, pos = _read_task(view, pos, version)
+        tasks.append(task)
+    return tasks, pos
+
+
+def _load_tasks(view, version=USER_SCHEMA_VERSION):
+    return _read_tasks(view, 0, version)[0]
+
+
+def _load_tracking(view):
+    days = array('I')
+    days.frombytes(view)
+    if sys.byteorder == 'big':
+        days.byteswap()
+    return days
+
+
+def _last_tracking(view):
+    return _U32.unpack_from(view, len(view) - _U32.size)[0]
+
+
+def _tracking_bytes(habit):
+    raw = habit._tracking
+    if type(raw) is Deferred and not raw.pending:
+        return raw.data
+    raw = habit.tracking
+    if sys.byteorder == 'big':
+        raw = array('I', raw)
+        raw.byteswap()
+    return raw.tobytes()
+
+
+def _completed_bytes(user):
+    raw = user._completed_tasks
+    if type(raw) is Deferred:
+        # Never decoded since it was read: copy the encoded blob through
+        # and append any tasks archived since then after it
+        if not raw.pending:
+            return raw.data
+        (count,) = _U32.unpack_from(raw.data, 0)
+        buf = bytearray(_U32.pack(count + len(raw.pending)))
+        buf += raw.data[4:]
+        for task in raw.pending:
+            _write_task(buf, task)
+        return buf
+    buf = bytearray()
+    _write_tasks(buf, raw)
+    return buf
+
+
+# ---------- users ----------
+
+def encode_user(user):
+    buf = bytearray(_HEADER.pack(USER_MAGIC, USER_SCHEMA_VERSION))
+    # Language first, at a fixed offset, so peek_language() can skip the rest
+    language = user.language.encode('utf-8')
+    buf += _U8.pack(len(language))
+    buf += language
+
+    settings = user.pomodoro_settings
+    buf += _USER_FIXED.pack(
+        user.points, user.pomodoro_count,
+        settings.work, settings.short_break, settings.long_break,
+        user.next_task_id, _FLAG_DIGEST if user.digest else 0
+    )
+    _pack_value(buf, user.team_id)
+    _pack_value(buf, list(user.categories))
+    _pack_value(buf, user.achievements)
+    _pack_value(buf, user.habit_streaks)
+    _pack_value(buf, [list(user.weekly_reports), list(user.monthly_reports), list(user.annual_reports)])
+
+    buf += _U16.pack(len(user.monthly_goals))
+    for goal in user.monthly_goals:
+        _write_str(buf, goal.goal)
+        buf += _GOAL_FIXED.pack(goal.created, goal.progress, goal.target, goal.done)
+        _pack_value(buf, goal.milestones)
+
+    buf += _U16.pack(len(user.habits))
+    for habit in user.habits:
+        _write_str(buf, habit.habit)
+        buf += _HABIT_FIXED.pack(habit.streak, habit.best_streak, _pack_goal(habit.goal))
+        _write_blob(buf, _tracking_bytes(habit))
+
+    _write_tasks(buf, user.tasks)
+    _write_tasks(buf, user.recurring_tasks)
+    _write_blob(buf, _completed_bytes(user))
+    return bytes(buf)
+
+
+def _decode_user(view, version=USER_SCHEMA_VERSION):
+    pos = _HEADER.size
+    length = view[pos]
+    pos += 1
+    user = User(str(view[pos:pos + length], 'utf-8'))
+    pos += length
+
+    if version == 1:
+        points, pomodoro_count, work, short_break, long_break = _USER_FIXED_V1.unpack_from(view, pos)
+        pos += _USER_FIXED_V1.size
+    elif version == 2:
+        points, pomodoro_count, work, short_break, long_break, user.next_task_id = _USER_FIXED_V2.unpack_from(view, pos)
+        pos += _USER_FIXED_V2.size
+    else:
+        points, pomodoro_count, work, short_break, long_break, user.next_task_id, flags = _USER_FIXED.unpack_from(view, pos)
+        pos += _USER_FIXED.size
+        user.digest = bool(flags & _FLAG_DIGEST)
+    user.points = points
+    user.pomodoro_count = pomodoro_count
+    user.pomodoro_settings = PomodoroSettings(work, short_break, long_break)
+
+    user.team_id, pos = _unpack_value(view, pos)
+    categories, pos = _unpack_value(view, pos)
+    user.categories = tuple(intern(c) for c in categories)
+    user.achievements, pos = _unpack_value(view, pos)
+    user.habit_streaks, pos = _unpack_value(view, pos)
+    reports, pos = _unpack_value(view, pos)
+    user.weekly_reports, user.monthly_reports, user.annual_reports = (tuple(r) for r in reports)
+
+    (count,) = _U16.unpack_from(view, pos)
+    pos += 2
+    goals = []
+    for _ in range(count):
+        text, pos = _read_str(view, pos)
+        if version < 4:
+            created, progress = _GOAL_FIXED_V1.unpack_from(view, pos)
+            target = done = 0
+            pos += _GOAL_FIXED_V1.size
+        else:
+            created, progress, target, done = _GOAL_FIXED.unpack_from(view, pos)
+            pos += _GOAL_FIXED.size
+        milestones, pos = _unpack_value(view, pos)
+        goals.append(Goal(text, created, progress, milestones, target, done))
+    user.monthly_goals = goals
+
+    (count,) = _U16.unpack_from(view, pos)
+    pos += 2
+    habits = []
+    for _ in range(count):
+        text, pos = _read_str(view, pos)
+        if version < 4:
+            streak, best_streak = _HABIT_FIXED_V1.unpack_from(view, pos)
+            goal = None
+            pos += _HABIT_FIXED_V1.size
+        else:
+            streak, best_streak, goal = _HABIT_FIXED.unpack_from(view, pos)
+            goal = _unpack_goal(goal)
+            pos += _HABIT_FIXED.size
+        tracking, pos = _read_blob(view, pos)
+        habits.append(Habit(text, Deferred(_load_tracking, tracking, _last_tracking), streak, best_streak, goal))
+    user.habits = habits
+
+    tasks, pos = _read_tasks(view, pos, version)
+    if version == 1:
+        for task in tasks:
+            user.add_task(task)
+    else:
+        user.tasks = TaskIndex(tasks)
+    user.recurring_tasks, pos = _read_tasks(view, pos, version)
+    completed, pos = _read_blob(view, pos)
+    user.completed_tasks = Deferred(partial(_load_tasks, version=version), completed)
+    return user
+
+
+def _migrate_user_v0(record):
+    """v0 -> current: JSON dict layout to the binary format"""
+    return encode_user(User.from_dict(json.loads(record)))
+
+
+def _migrate_user_v1(record):
+    """v1 -> current: number tasks and re-encode the archive with the new task layout"""
+    user = _decode_user(memoryview(record), 1)
+    user.completed_tasks = list(user.completed_tasks)
+    return encode_user(user)
+
+
+def _migrate_user_v2(record):
+    """v2 -> current: add the flags byte (digest on by default)"""
+    user = _decode_user(memoryview(record), 2)
+    # The archive blob is copied through as-is unless decoded, and its
+    # task layout has changed since v2
+    user.completed_tasks = list(user.completed_tasks)
+    return encode_user(user)
+
+
+def _migrate_user_v3(record):
+    """v3 -> current: re-encode the archive with the goal link on each task"""
+    user = _decode_user(memoryview(record), 3)
+    user.completed_tasks = list(user.completed_tasks)
+    return encode_user(user)
+
+
+# ---------- teams ----------
+
+def encode_team(team):
+    buf = bytearray(_HEADER.pack(TEAM_MAGIC, TEAM_SCHEMA_VERSION))
+    _pack_value(buf, team.get('members', []))
+    _pack_value(buf, team.get('shared_goals', []))
+    return bytes(buf)
+
+
+def _decode_team_v1(view):
+    pos = _HEADER.size
+    members, pos = _unpack_value(view, pos)
+    shared_goals, pos = _unpack_value(view, pos)
+    return {'members': members, 'shared_goals': shared_goals}
+
+
+def _migrate_team_v0(record):
+    """v0 -> current: JSON dict layout to the binary format"""
+    return encode_team(json.loads(record))
+
+
+# version -> function upgrading a record of that version by one step
+USER_MIGRATIONS = {0: _migrate_user_v0, 1: _migrate_user_v1, 2: _migrate_user_v2, 3: _migrate_user_v3}
+TEAM_MIGRATIONS = {0: _migrate_team_v0}
+
+
+def record_version(record, magic):
+    if record[:2] != magic:
+        return 0
+    return record[2]
+
+
+def _upgrade(record, magic, migrations, current):
+    version = record_version(record, magic)
+    if version > current:
+        raise RecordError(f"record version {version} is newer than {current}")
+    while version < current:
+        record = migrations[version](record)
+        version = record_version(record, magic)
+    return record
+
+
+def upgrade_user(record):
+    """The record migrated to the current version (the same object if it already is)"""
+    return _upgrade(record, USER_MAGIC, USER_MIGRATIONS, USER_SCHEMA_VERSION)
+
+
+def upgrade_team(record):
+    return _upgrade(record, TEAM_MAGIC, TEAM_MIGRATIONS, TEAM_SCHEMA_VERSION)
+
+
+def decode_user(record):
+    return _decode_user(memoryview(upgrade_user(record)))
+
+
+def decode_team(record):
+    return _decode_team_v1(memoryview(upgrade_team(record)))
+
+
+def peek_language(record):
+    """Read only the language of a user record"""
+    if record_version(record, USER_MAGIC) != USER_SCHEMA_VERSION:
+        return decode_user(record).language
+    length = record[_HEADER.size]
+    start = _HEADER.size + 1
+    return intern(record[start:start + length].decode('utf-8'))
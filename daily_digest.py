@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import re
+
+from models import today_epoch_day
+
+# ==================== DAILY DIGEST ====================
+#
+# Morning digest and evening review for every user who has them enabled.
+# Users are streamed from storage one chunk at a time and rendered into a
+# bounded queue; a single sender drains it at an even pace spread across
+# the delivery window (never faster than max_rate messages per second).
+# Only one chunk of decoded users and at most queue_size rendered
+# messages exist at any time, however many users there are.
+
+logger = logging.getLogger(__name__)
+
+MAX_LISTED_TASKS = 5
+AT_RISK_STREAK = 2
+
+# Characters with meaning in Telegram's (legacy) Markdown
+_MARKDOWN = re.compile(r'([_*`\[])')
+
+
+def escape(text):
+    """User text made safe for a parse_mode='Markdown' message"""
+    return _MARKDOWN.sub(r'\\\1', text)
+
+
+def _streaks_at_risk(user, today):
+    return [h for h in user.habits if h.streak >= AT_RISK_STREAK and not h.done_on(today)]
+
+
+def _format_streaks(habits):
+    return ", ".join(f"{escape(h.habit)} (🔥{h.streak})" for h in habits)
+
+
+def render_morning(user, texts):
+    """Morning digest text, or None if there is nothing to report"""
+    if not user.tasks.open and not user.habits:
+        return None
+    today = today_epoch_day()
+
+    msg = texts['digest_morning_title']
+    open_tasks = list(user.tasks.open.values())
+    msg += texts['digest_open_tasks'].format(count=len(open_tasks))
+    for task in open_tasks[:MAX_LISTED_TASKS]:
+        msg += f"  • {escape(task.task)}" + (f" ({escape(task.time)})" if task.time else "") + "\n"
+    if len(open_tasks) > MAX_LISTED_TASKS:
+        msg += f"  … +{len(open_tasks) - MAX_LISTED_TASKS}\n"
+
+    pending = sum(1 for h in user.habits if not h.done_on(today))
+    if pending:
+        msg += texts['digest_pending_habits'].format(count=pending)
+    at_risk = _streaks_at_risk(user, today)
+    if at_risk:
+        msg += texts['digest_streaks_at_risk'].format(habits=_format_streaks(at_risk))
+    msg += texts['digest_points'].format(points=user.points)
+    return msg + texts['digest_off_hint']
+
+
+def render_evening(user, texts):
+    """Evening review text, or None if there is nothing to report"""
+    if not len(user.tasks) and not user.habits:
+        return None
+    today = today_epoch_day()
+
+    msg = texts['digest_evening_title']
+    msg += texts['digest_done_today'].format(done=len(user.tasks.done), total=len(user.tasks))
+    done = sum(1 for h in user.habits if h.done_on(today))
+    msg += texts['digest_habits_done'].format(done=done, total=len(user.habits))
+    at_risk = _streaks_at_risk(user, today)
+    if at_risk:
+        msg += texts['digest_keep_streaks'].format(habits=_format_streaks(at_risk))
+    msg += texts['digest_points'].format(points=user.points)
+    return msg + texts['digest_off_hint']
+
+
+async def run_digest(chunks, render, send, total, window, max_rate=25, queue_size=1000):
+    """Render users from `chunks` and send them spread across `window` seconds
+
+    chunks yields lists of (user_id, user); render(user_id, user) returns
+    the text or None to skip; send(user_id, text) delivers one message.
+    Returns (sent, failed).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    interval = max(window / max(total, 1), 1.0 / max_rate)
+
+    async def produce():
+        try:
+            for chunk in chunks:
+                for user_id, user in chunk:
+                    text = render(user_id, user)
+                    if text:
+                        # Blocks while the sender is behind, so rendering
+                        # never runs far ahead of delivery
+                        await queue.put((user_id, text))
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    sent = failed = 0
+    next_at = loop.time()
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        next_at = max(next_at, loop.time()) + interval
+        try:
+            await send(*item)
+            sent += 1
+        except Exception as e:
+            # Blocked the bot, deactivated account, ...
+            logger.info(f"Digest to {item[0]} failed: {e}")
+            failed += 1
+    await producer
+    return sent, failed
@@ -0,0 +1,61 @@
+# ==================== DASHBOARDS ====================
+#
+# /status and /habits post one inline-keyboard message per user that later
+# interactions edit in place instead of answering with new messages. Taps
+# that arrive close together are coalesced into one edit (the handler
+# schedules a single refresh while one is pending), and an edit is skipped
+# outright when the rendered text and buttons are the same as last time.
+#
+# Keyboards are passed around as rows of (label, callback_data) tuples so
+# they can be compared cheaply; the bot turns them into Telegram markup.
+
+
+def digest(text, rows):
+    return hash((text, tuple(tuple(row) for row in rows)))
+
+
+class DashboardRegistry:
+    """Tracks each user's dashboard messages and what they currently show"""
+
+    def __init__(self, delay=1.5):
+        # Seconds to wait for more taps before editing
+        self.delay = delay
+        self._messages = {}
+        self._shown = {}
+        self._pending = set()
+
+    def register(self, user_id, kind, chat_id, message_id, text=None, rows=None):
+        previous = self._messages.setdefault(user_id, {}).get(kind)
+        if previous is not None and previous != (chat_id, message_id):
+            self._shown.pop(previous, None)
+        self._messages[user_id][kind] = (chat_id, message_id)
+        if text is not None:
+            self._shown[(chat_id, message_id)] = digest(text, rows or [])
+
+    def forget(self, user_id, kind):
+        message = self._messages.get(user_id, {}).pop(kind, None)
+        if message is not None:
+            self._shown.pop(message, None)
+
+    def dashboards(self, user_id):
+        """(kind, chat_id, message_id) for each dashboard the user has open"""
+        return [(kind, chat_id, message_id)
+                for kind, (chat_id, message_id) in self._messages.get(user_id, {}).items()]
+
+    def changed(self, chat_id, message_id, text, rows):
+        """True (and remembered) if this render differs from what is shown"""
+        new = digest(text, rows)
+        if self._shown.get((chat_id, message_id)) == new:
+            return False
+        self._shown[(chat_id, message_id)] = new
+        return True
+
+    def request_refresh(self, user_id):
+        """True if a refresh should be scheduled; False if one is already pending"""
+        if not self._messages.get(user_id) or user_id in self._pending:
+            return False
+        self._pending.add(user_id)
+        return True
+
+    def refresh_started(self, user_id):
+        self._pending.discard(user_id)
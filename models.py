@@ -0,0 +1,438 @@
+import sys
+import time
+from array import array
+from datetime import date, datetime
+
+# ==================== USER MODEL ====================
+#
+# Compact in-memory records for users and their habits, tasks and goals.
+# Every class uses __slots__ (no per-instance __dict__), short repeated
+# strings such as language and category are interned so all users share
+# one copy, timestamps are epoch seconds and habit check-ins are epoch
+# days packed into an array.
+#
+# to_dict()/from_dict() convert to and from the storage layout. from_dict()
+# also accepts the older layout with ISO timestamp strings.
+
+DEFAULT_CATEGORIES = ('Work', 'Personal', 'Health')
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Goal progress percentages that trigger a notification
+GOAL_MILESTONES = (25, 50, 75, 100)
+# Check-ins a linked habit contributes to its goal's target: about a month
+HABIT_TARGET = 30
+
+
+def intern(value):
+    return sys.intern(value) if value is not None else None
+
+
+def now_epoch():
+    return int(time.time())
+
+
+def today_epoch_day():
+    return date.today().toordinal() - EPOCH_ORDINAL
+
+
+def to_epoch(value):
+    """Epoch seconds from an int, a datetime or an ISO string"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
+
+
+def to_epoch_day(value):
+    """Epoch day from an int, a date or an ISO date string"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def epoch_day_to_date(day):
+    return date.fromordinal(day + EPOCH_ORDINAL)
+
+
+class Deferred:
+    """A sub-collection left in its encoded form until first accessed"""
+
+    __slots__ = ('loader', 'data', 'pending', 'peek')
+
+    def __init__(self, loader, data, peek=None):
+        self.loader = loader
+        self.data = data
+        # Items appended without decoding; encoders write them after data
+        self.pending = []
+        # Optional: reads the last item straight from data
+        self.peek = peek
+
+    def load(self):
+        value = self.loader(self.data)
+        value.extend(self.pending)
+        return value
+
+    def last(self):
+        """Last item without decoding the collection, or None if empty"""
+        if self.pending:
+            return self.pending[-1]
+        return self.peek(self.data) if len(self.data) else None
+
+
+class PomodoroSettings:
+    __slots__ = ('work', 'short_break', 'long_break')
+
+    def __init__(self, work=25, short_break=5, long_break=15):
+        self.work = work
+        self.short_break = short_break
+        self.long_break = long_break
+
+    def to_dict(self):
+        return {'work': self.work, 'break': self.short_break, 'long_break': self.long_break}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('work', 25), data.get('break', 5), data.get('long_break', 15))
+
+
+class Habit:
+    __slots__ = ('habit', '_tracking', 'streak', 'best_streak', 'goal')
+
+    def __init__(self, habit, tracking=None, streak=0, best_streak=0, goal=None):
+        self.habit = habit
+        # Epoch days the habit was checked off, in ascending order
+        self._tracking = tracking if isinstance(tracking, Deferred) else array('I', tracking or ())
+        self.streak = streak
+        self.best_streak = best_streak
+        # Index into the user's monthly_goals, or None
+        self.goal = goal
+
+    @property
+    def tracking(self):
+        if type(self._tracking) is Deferred:
+            self._tracking = self._tracking.load()
+        return self._tracking
+
+    @tracking.setter
+    def tracking(self, value):
+        self._tracking = value
+
+    def done_on(self, day):
+        # Check-ins are appended in order, so only the last one can be today
+        raw = self._tracking
+        if type(raw) is Deferred and raw.peek is not None:
+            # Still encoded: read the last check-in without decoding the rest
+            return raw.last() == day
+        return bool(raw) and raw[-1] == day
+
+    def to_dict(self):
+        return {
+            'habit': self.habit,
+            'tracking': self.tracking.tolist(),
+            'streak': self.streak,
+            'best_streak': self.best_streak,
+            'goal': self.goal
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['habit'],
+            [to_epoch_day(d) for d in data.get('tracking', ())],
+            data.get('streak', 0),
+            data.get('best_streak', 0),
+            data.get('goal')
+        )
+
+
+class Task:
+    __slots__ = ('id', 'task', 'category', 'recurring', 'time', 'completed', 'created', 'completed_at', 'goal')
+
+    def __init__(self, task, category='General', recurring=None, time=None,
+                 completed=False, created=None, id=None, completed_at=None, goal=None):
+        self.id = id
+        self.task = task
+        self.category = intern(category)
+        self.recurring = intern(recurring)
+        self.time = time
+        self.completed = completed
+        self.created = created if created is not None else now_epoch()
+        self.completed_at = completed_at
+        # Index into the user's monthly_goals, or None
+        self.goal = goal
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task': self.task,
+            'category': self.category,
+            'recurring': self.recurring,
+            'time': self.time,
+            'completed': self.completed,
+            'created': self.created,
+            'completed_at': self.completed_at,
+            'goal': self.goal
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['task'],
+            data.get('category', 'General'),
+            data.get('recurring'),
+            data.get('time'),
+            data.get('completed', False),
+            to_epoch(data.get('created')),
+            data.get('id'),
+            to_epoch(data.get('completed_at')),
+            data.get('goal')
+        )
+
+
+class TaskIndex:
+    """Today's tasks keyed by id, split into open and completed sets
+
+    Both sets are dicts, so lookups by id and the counts shown by /status
+    are O(1) and stay current as tasks move between them.
+    """
+
+    __slots__ = ('open', 'done')
+
+    def __init__(self, tasks=()):
+        self.open = {}
+        self.done = {}
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self):
+        return len(self.open) + len(self.done)
+
+    def __iter__(self):
+        yield from self.open.values()
+        yield from self.done.values()
+
+    def add(self, task):
+        (self.done if task.completed else self.open)[task.id] = task
+
+    def get(self, task_id):
+        return self.open.get(task_id) or self.done.get(task_id)
+
+    def complete(self, task_id):
+        """Mark an open task done; None if it is not open"""
+        task = self.open.pop(task_id, None)
+        if task is None:
+            return None
+        task.completed = True
+        task.completed_at = now_epoch()
+        self.done[task_id] = task
+        return task
+
+    def archive(self):
+        """Remove and return the completed tasks"""
+        done = list(self.done.values())
+        self.done = {}
+        return done
+
+
+class Goal:
+    """A monthly goal whose progress is kept current as linked work is done
+
+    Linking a task adds one unit to `target` and linking a habit adds
+    HABIT_TARGET (a month of check-ins); completing a linked task or
+    checking a linked habit adds to `done`. `progress` is the resulting
+    percentage, stored so reports and /goals never have to recount history.
+    """
+
+    __slots__ = ('goal', 'created', 'progress', 'milestones', 'target', 'done')
+
+    def __init__(self, goal, created=None, progress=0, milestones=None, target=0, done=0):
+        self.goal = goal
+        self.created = created if created is not None else now_epoch()
+        self.progress = progress
+        # Percentages from GOAL_MILESTONES already reached
+        self.milestones = milestones if milestones is not None else []
+        self.target = target
+        self.done = done
+
+    def add_target(self, amount):
+        self.target = max(self.target + amount, 0)
+        self._update()
+
+    def advance(self, amount=1):
+        """Record linked work done; returns the milestones newly reached"""
+        self.done += amount
+        return self._update()
+
+    def _update(self):
+        # Check-ins past a habit's month still count, but never past 100%
+        self.done = min(self.done, self.target)
+        self.progress = min(100, self.done * 100 // self.target) if self.target else 0
+        reached = [m for m in GOAL_MILESTONES if m <= self.progress and m not in self.milestones]
+        self.milestones.extend(reached)
+        return reached
+
+    def to_dict(self):
+        return {
+            'goal': self.goal,
+            'created': self.created,
+            'progress': self.progress,
+            'milestones': list(self.milestones),
+            'target': self.target,
+            'done': self.done
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['goal'],
+            to_epoch(data.get('created')),
+            data.get('progress', 0),
+            list(data.get('milestones', ())),
+            data.get('target', 0),
+            data.get('done', 0)
+        )
+
+
+class User:
+    __slots__ = (
+        'language', 'monthly_goals', 'habits', 'habit_streaks', 'tasks',
+        'recurring_tasks', '_completed_tasks', 'categories', 'pomodoro_settings',
+        'pomodoro_count', 'weekly_reports', 'monthly_reports', 'annual_reports',
+        'team_id', 'points', 'achievements', 'next_task_id', 'digest'
+    )
+
+    def __init__(self, language='en'):
+        self.language = intern(language)
+        self.monthly_goals = []
+        self.habits = []
+        self.habit_streaks = {}
+        self.tasks = TaskIndex()
+        self.recurring_tasks = []
+        self._completed_tasks = []
+        # Replaced wholesale on language change, never mutated in place
+        self.categories = DEFAULT_CATEGORIES
+        self.pomodoro_settings = PomodoroSettings()
+        self.pomodoro_count = 0
+        # Not written by any handler yet; share one empty tuple until they are
+        self.weekly_reports = ()
+        self.monthly_reports = ()
+        self.annual_reports = ()
+        self.team_id = None
+        self.points = 0
+        self.achievements = []
+        self.next_task_id = 1
+        # Morning digest and evening review messages
+        self.digest = True
+
+    @property
+    def completed_tasks(self):
+        # The archive grows without bound, so decoders may defer it
+        if type(self._completed_tasks) is Deferred:
+            self._completed_tasks = self._completed_tasks.load()
+        return self._completed_tasks
+
+    @completed_tasks.setter
+    def completed_tasks(self, value):
+        self._completed_tasks = value
+
+    def add_task(self, task):
+        task.id = self.next_task_id
+        self.next_task_id += 1
+        self.tasks.add(task)
+        return task
+
+    def goal_of(self, item):
+        """The goal a task or habit is linked to, or None"""
+        if item.goal is None or item.goal >= len(self.monthly_goals):
+            return None
+        return self.monthly_goals[item.goal]
+
+    def link_task(self, task, index):
+        task.goal = index
+        self.monthly_goals[index].add_target(1)
+
+    def link_habit(self, habit, index):
+        """Count a habit toward a goal; False if it already counts toward another
+
+        Check-ins already credited to a goal stay there, so a linked habit
+        can't be moved without leaving that goal's progress wrong.
+        """
+        if self.goal_of(habit) is not None:
+            return habit.goal == index
+        habit.goal = index
+        self.monthly_goals[index].add_target(HABIT_TARGET)
+        return True
+
+    def set_goals(self, goals):
+        """Replace the monthly goals, dropping links to the old ones"""
+        self.monthly_goals = [Goal(g) for g in goals]
+        for task in self.tasks:
+            task.goal = None
+        for task in self.recurring_tasks:
+            task.goal = None
+        for habit in self.habits:
+            habit.goal = None
+
+    def archive_completed(self):
+        """Move completed tasks out of the hot index into the archive"""
+        done = self.tasks.archive()
+        if done:
+            archive = self._completed_tasks
+            if type(archive) is Deferred:
+                # Append without decoding the archive
+                archive.pending.extend(done)
+            else:
+                archive.extend(done)
+        return done
+
+    def to_dict(self):
+        return {
+            'language': self.language,
+            'monthly_goals': [g.to_dict() for g in self.monthly_goals],
+            'habits': [h.to_dict() for h in self.habits],
+            'habit_streaks': dict(self.habit_streaks),
+            'tasks': [t.to_dict() for t in self.tasks],
+            'recurring_tasks': [t.to_dict() for t in self.recurring_tasks],
+            'completed_tasks': [t.to_dict() for t in self.completed_tasks],
+            'categories': list(self.categories),
+            'pomodoro_settings': self.pomodoro_settings.to_dict(),
+            'pomodoro_count': self.pomodoro_count,
+            'weekly_reports': list(self.weekly_reports),
+            'monthly_reports': list(self.monthly_reports),
+            'annual_reports': list(self.annual_reports),
+            'team_id': self.team_id,
+            'points': self.points,
+            'achievements': list(self.achievements),
+            'next_task_id': self.next_task_id,
+            'digest': self.digest
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        user = cls(data.get('language') or 'en')
+        user.monthly_goals = [Goal.from_dict(g) for g in data.get('monthly_goals', ())]
+        user.habits = [Habit.from_dict(h) for h in data.get('habits', ())]
+        user.habit_streaks = dict(data.get('habit_streaks', {}))
+        tasks = [Task.from_dict(t) for t in data.get('tasks', ())]
+        user.digest = data.get('digest', True)
+        user.next_task_id = max([data.get('next_task_id', 1)] + [t.id + 1 for t in tasks if t.id is not None])
+        for task in tasks:
+            if task.id is None:
+                user.add_task(task)
+            else:
+                user.tasks.add(task)
+        user.recurring_tasks = [Task.from_dict(t) for t in data.get('recurring_tasks', ())]
+        user.completed_tasks = [Task.from_dict(t) for t in data.get('completed_tasks', ())]
+        if data.get('categories'):
+            user.categories = tuple(intern(c) for c in data['categories'])
+        user.pomodoro_settings = PomodoroSettings.from_dict(data.get('pomodoro_settings', {}))
+        user.pomodoro_count = data.get('pomodoro_count', 0)
+        user.weekly_reports = tuple(data.get('weekly_reports', ()))
+        user.monthly_reports = tuple(data.get('monthly_reports', ()))
+        user.annual_reports = tuple(data.get('annual_reports', ()))
+        user.team_id = data.get('team_id')
+        user.points = data.get('points', 0)
+        user.achievements = list(data.get('achievements', ()))
+        return user
@@ -0,0 +1,80 @@
+import io
+import re
+import subprocess
+
+from PIL import Image, ImageOps
+
+# ==================== PHOTO OCR ====================
+#
+# Turns a photo of a to-do list into task lines. extract_lines() is the
+# unit of work sent to the OCR worker pool: it downscales and binarizes
+# the image with Pillow, then pipes a PNG through the tesseract binary
+# installed from the aptfile (stdin to stdout, no temp files).
+
+MAX_SIDE = 2000
+TESSERACT_TIMEOUT = 60
+
+# Bullets, checkboxes and numbering in front of list items
+_LIST_MARKER = re.compile(r'^\s*(?:[-*•·>□☐☑☒✓✔]+|\[\s?[xX✓]?\s?\]|\(?\d{1,2}[.)])\s*')
+
+
+def _otsu_threshold(histogram):
+    """Grey level that best separates ink from paper"""
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 127, 0.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def preprocess(data):
+    """Greyscale, downscale and binarize an image; returns PNG bytes"""
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image).convert('L')
+    image.thumbnail((MAX_SIDE, MAX_SIDE))
+    image = ImageOps.autocontrast(image)
+    threshold = _otsu_threshold(image.histogram())
+    image = image.point(lambda p: 255 if p > threshold else 0, mode='1')
+
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+    return out.getvalue()
+
+
+def run_tesseract(png, language='eng'):
+    result = subprocess.run(
+        ['tesseract', 'stdin', 'stdout', '-l', language, '--psm', '6'],
+        input=png,
+        capture_output=True,
+        timeout=TESSERACT_TIMEOUT,
+        check=True
+    )
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def clean_lines(text):
+    lines = []
+    for line in text.splitlines():
+        line = _LIST_MARKER.sub('', line).strip()
+        # Stray marks and speckles come out as one or two characters
+        if len(line) > 2:
+            lines.append(line)
+    return lines
+
+
+def extract_lines(data):
+    """Task lines read from a photo; runs in a worker process"""
+    return clean_lines(run_tesseract(preprocess(data)))
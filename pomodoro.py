@@ -0,0 +1,141 @@
+import time
+
+# ==================== POMODORO SESSIONS ====================
+#
+# One session per user moves through work -> break -> work -> ... and a
+# long break after every LONG_BREAK_EVERY work sessions, ending after the
+# long break. The bot keeps exactly one phase-end job per session (stored
+# on the session so it can be cancelled without scanning the job queue).
+#
+# Live countdowns edit the session's message from one shared ticker. The
+# gap between edits of any one message grows with the number of live
+# sessions so the total edit rate stays under EDIT_BUDGET per second.
+
+WORK = 'work'
+SHORT_BREAK = 'break'
+LONG_BREAK = 'long_break'
+
+LONG_BREAK_EVERY = 4
+EDIT_BUDGET = 20          # countdown edits per second across all users
+MIN_EDIT_INTERVAL = 15    # seconds between edits of one message
+
+
+class PomodoroSession:
+    __slots__ = (
+        'user_id', 'chat_id', 'message_id', 'settings', 'phase', 'cycle',
+        'ends_at', 'remaining', 'job', 'live', 'next_edit', 'shown'
+    )
+
+    def __init__(self, user_id, chat_id, settings):
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.message_id = None
+        self.settings = settings
+        self.phase = None
+        # Work sessions completed in this session
+        self.cycle = 0
+        self.ends_at = None
+        # Seconds left while paused, None while running
+        self.remaining = None
+        self.job = None
+        self.live = False
+        self.next_edit = 0.0
+        # dashboard.digest() of the message as last sent or edited
+        self.shown = None
+
+    @property
+    def paused(self):
+        return self.remaining is not None
+
+    def duration(self, phase):
+        minutes = {
+            WORK: self.settings.work,
+            SHORT_BREAK: self.settings.short_break,
+            LONG_BREAK: self.settings.long_break,
+        }[phase]
+        return minutes * 60
+
+    def begin(self, phase, now=None):
+        """Enter a phase; returns its length in seconds"""
+        now = time.monotonic() if now is None else now
+        self.phase = phase
+        self.remaining = None
+        self.ends_at = now + self.duration(phase)
+        self.shown = None
+        return self.duration(phase)
+
+    def pause(self, now=None):
+        now = time.monotonic() if now is None else now
+        if not self.paused:
+            self.remaining = max(0.0, self.ends_at - now)
+
+    def resume(self, now=None):
+        """Continue a paused phase; returns the seconds left"""
+        now = time.monotonic() if now is None else now
+        left = self.remaining
+        self.ends_at = now + left
+        self.remaining = None
+        return left
+
+    def seconds_left(self, now=None):
+        if self.paused:
+            return self.remaining
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.ends_at - now)
+
+    def next_phase(self):
+        """Phase after the current one ends, or None when the set is done"""
+        if self.phase == WORK:
+            return LONG_BREAK if self.cycle % LONG_BREAK_EVERY == 0 else SHORT_BREAK
+        if self.phase == SHORT_BREAK:
+            return WORK
+        return None
+
+
+class SessionManager:
+    def __init__(self):
+        self.sessions = {}
+        # user ids with a live countdown
+        self.live = set()
+
+    def get(self, user_id):
+        return self.sessions.get(user_id)
+
+    def start(self, user_id, chat_id, settings):
+        """The user's session, created if needed; any pending job is the caller's to cancel"""
+        session = self.sessions.get(user_id)
+        if session is None:
+            session = self.sessions[user_id] = PomodoroSession(user_id, chat_id, settings)
+        session.settings = settings
+        return session
+
+    def end(self, user_id):
+        self.live.discard(user_id)
+        return self.sessions.pop(user_id, None)
+
+    def set_live(self, session, live):
+        session.live = live
+        session.next_edit = 0.0
+        if live:
+            self.live.add(session.user_id)
+        else:
+            self.live.discard(session.user_id)
+
+    def edit_interval(self):
+        """Seconds between edits of one countdown message at current load"""
+        return max(MIN_EDIT_INTERVAL, len(self.live) / EDIT_BUDGET)
+
+    def due_countdowns(self, limit, now=None):
+        """Up to limit live, running sessions whose countdown is due for an edit"""
+        now = time.monotonic() if now is None else now
+        interval = self.edit_interval()
+        due = []
+        for user_id in self.live:
+            session = self.sessions[user_id]
+            if session.paused or not session.message_id or session.next_edit > now:
+                continue
+            session.next_edit = now + interval
+            due.append(session)
+            if len(due) >= limit:
+                break
+        return due
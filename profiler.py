@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# ==================== SAMPLING PROFILER ====================
+#
+# Nothing here runs until an admin starts a session: handlers are not
+# wrapped, so the bot pays no cost while the profiler is off. A session
+# starts one daemon thread that snapshots the event loop thread's stack
+# with sys._current_frames() and tags each sample with the handler or
+# job callback found on that stack. Samples with neither are idle when the
+# loop is waiting in its selector, and "(other)" with their full stack
+# otherwise (one-off jobs scheduled after the session started, library
+# internals), so no CPU time is mistaken for idle time.
+
+IDLE = '(idle)'
+OTHER = '(other)'
+
+
+def collect_callbacks(handlers):
+    """Collect handler callbacks, descending into conversation handlers"""
+    callbacks = []
+    for handler in handlers:
+        callback = getattr(handler, 'callback', None)
+        if callback is not None:
+            callbacks.append(callback)
+        nested = list(getattr(handler, 'entry_points', []) or [])
+        for state_handlers in (getattr(handler, 'states', None) or {}).values():
+            nested.extend(state_handlers)
+        nested.extend(getattr(handler, 'fallbacks', []) or [])
+        if nested:
+            callbacks.extend(collect_callbacks(nested))
+    return callbacks
+
+
+def application_callbacks(application):
+    """All handler and scheduled job callbacks of a telegram Application"""
+    handlers = []
+    for group in application.handlers.values():
+        handlers.extend(group)
+    callbacks = collect_callbacks(handlers)
+    if application.job_queue is not None:
+        callbacks.extend(job.callback for job in application.job_queue.jobs())
+    return callbacks
+
+
+def _is_idle(codes):
+    # The loop blocks in selectors.*.select() while waiting for I/O
+    leaf = codes[-1]
+    return leaf.co_name in ('select', 'poll') and os.path.basename(leaf.co_filename) == 'selectors.py'
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Periodically samples one thread's stack, aggregated per handler"""
+
+    def __init__(self, callbacks=(), interval=0.005):
+        self.interval = interval
+        self.handler_codes = {}
+        for callback in callbacks:
+            code = getattr(callback, '__code__', None)
+            if code is not None:
+                self.handler_codes[code] = callback.__name__
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id=None):
+        if self.running:
+            raise RuntimeError("profiler is already running")
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self._target)
+        if frame is None:
+            return
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+
+        # Keep the stack from the outermost handler frame down; frames
+        # above it are the event loop and dispatcher, identical for all.
+        handler = None
+        for i, code in enumerate(codes):
+            name = self.handler_codes.get(code)
+            if name is not None:
+                handler = name
+                codes = codes[i:]
+                break
+        if handler is None:
+            if _is_idle(codes):
+                handler = IDLE
+                codes = codes[-1:]
+            else:
+                handler = OTHER
+
+        self.stacks[(handler,) + tuple(_frame_label(c) for c in codes)] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top=20):
+        """Plain-text summary: samples per handler and top self-time frames"""
+        per_handler = Counter()
+        self_time = defaultdict(Counter)
+        for stack, count in self.stacks.items():
+            handler = stack[0]
+            per_handler[handler] += count
+            self_time[handler][stack[-1]] += count
+
+        total = self.samples or 1
+        lines = [
+            f"Samples: {self.samples} over {self.elapsed:.1f}s "
+            f"(interval {self.interval * 1000:.1f}ms)",
+            "",
+        ]
+        for handler, count in per_handler.most_common():
+            lines.append(f"{handler}: {count} samples ({100.0 * count / total:.1f}%)")
+            if handler == IDLE:
+                continue
+            for label, own in self_time[handler].most_common(top):
+                lines.append(f"    {own:6d}  {100.0 * own / total:5.1f}%  {label}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,107 @@
+import re
+
+# ==================== QUICK-ADD SYNTAX ====================
+#
+# Lets one /add message create many fully specified tasks without the
+# category -> recurring -> time round trips:
+#
+#   Finish report #work @14:30 !daily
+#   Call dentist #health 30m
+#
+#   #category     one of the user's categories, matched case-insensitively;
+#                 other hashtags ("Review PR #42") stay in the task text
+#   @HH:MM        start time
+#   30m / 2h / 1h30m / 45min   duration, stored in minutes like the
+#                 interactive flow's "duration in minutes" answer
+#   !daily / !weekly   recurrence
+#   +N            link to monthly goal number N (1-3, as listed by /goals)
+#
+# Annotations are the tokens at the end of a line, so "Buy 2m cable" and
+# "Fix #42 crash" keep their text: the first token from the right that is
+# not an annotation ends them. Each line is split on whitespace once and
+# tokens are classified by their first character. Lines with no
+# annotations are returned separately for the interactive flow.
+
+RECURRENCE = {'daily': 'daily', 'weekly': 'weekly'}
+_TIME = re.compile(r'@([01]?\d|2[0-3]):([0-5]\d)$')
+_GOAL = re.compile(r'\+([1-3])$')
+_DURATION = re.compile(r'(?:(\d+)h)?(?:(\d+)m(?:in)?)?$')
+
+
+def _duration_minutes(token):
+    match = _DURATION.match(token)
+    if match is None or not (match.group(1) or match.group(2)):
+        return None
+    return int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+
+
+def _annotation(token, lookup):
+    """(field, value) for an annotation token, or None if it is task text"""
+    first = token[0]
+    if first == '#':
+        match = lookup.get(token[1:].lower())
+        if match is not None:
+            return 'category', match
+    elif first == '@':
+        match = _TIME.match(token)
+        if match:
+            return 'time', f"{int(match.group(1)):02d}:{match.group(2)}"
+    elif first == '!':
+        value = RECURRENCE.get(token[1:].lower())
+        if value:
+            return 'recurring', value
+    elif first == '+':
+        # Only the three goal numbers, so "+15551234567" stays text
+        match = _GOAL.match(token)
+        if match:
+            return 'goal', int(match.group(1)) - 1
+    elif first.isdigit() and token[-1] in 'hmn':
+        minutes = _duration_minutes(token)
+        if minutes:
+            return 'time', str(minutes)
+    return None
+
+
+def _parse(line, lookup):
+    words = line.split()
+    fields = {}
+    while words:
+        annotation = _annotation(words[-1], lookup)
+        if annotation is None:
+            break
+        words.pop()
+        # Read right to left, so keep the first value: the line's last
+        fields.setdefault(*annotation)
+
+    if not fields or not words:
+        return None
+    return {
+        'task': ' '.join(words),
+        'category': fields.get('category', 'General'),
+        'recurring': fields.get('recurring'),
+        'time': fields.get('time'),
+        'completed': False,
+        'goal': fields.get('goal')
+    }
+
+
+def parse_line(line, categories=()):
+    """Task dict for an annotated line, or None if the line has no annotations"""
+    return _parse(line, {c.lower(): c for c in categories})
+
+
+def parse_lines(text, categories=()):
+    """Split a message into (parsed task dicts, plain lines for the interactive flow)"""
+    lookup = {c.lower(): c for c in categories}
+    parsed = []
+    plain = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        task = _parse(line, lookup)
+        if task is None:
+            plain.append(line)
+        else:
+            parsed.append(task)
+    return parsed, plain
@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+
+# ==================== STORAGE BACKENDS ====================
+#
+# Both backends hold encoded user and team records (see codec.py) and
+# expose the same raw-record API, which is all bulk export/import needs:
+#
+#   count_users() / count_teams()
+#   iter_user_records(chunk_size) / iter_team_records(chunk_size)
+#       yield lists of (id, record bytes), one chunk at a time
+#   put_user_records(pairs) / put_team_records(pairs)
+#       insert or replace a batch of (id, record bytes)
+#
+# MemoryStore is what the bot runs on today (ProductivityDB extends it).
+# PostgresStore keeps the same records in two tables and streams reads
+# through a server-side cursor, so neither side ever loads every record.
+
+
+def _chunks(records, chunk_size):
+    # Snapshot the keys so records saved meanwhile don't break iteration
+    keys = list(records)
+    for start in range(0, len(keys), chunk_size):
+        chunk = []
+        for key in keys[start:start + chunk_size]:
+            record = records.get(key)
+            if record is not None:
+                chunk.append((key, record))
+        yield chunk
+
+
+class MemoryStore:
+    """Encoded records in process memory"""
+
+    def __init__(self):
+        self.users = {}
+        self.teams = {}
+
+    def count_users(self):
+        return len(self.users)
+
+    def count_teams(self):
+        return len(self.teams)
+
+    def iter_user_records(self, chunk_size=500):
+        return _chunks(self.users, chunk_size)
+
+    def iter_team_records(self, chunk_size=500):
+        return _chunks(self.teams, chunk_size)
+
+    def put_user_records(self, pairs):
+        self.users.update(pairs)
+
+    def put_team_records(self, pairs):
+        self.teams.update(pairs)
+
+
+class PostgresStore:
+    """Encoded records in PostgreSQL, one bytea row per user or team
+
+    Connections come from a thread-safe pool so batches can be written
+    from several import threads at once.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS users (id BIGINT PRIMARY KEY, record BYTEA NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS teams (id TEXT PRIMARY KEY, record BYTEA NOT NULL)",
+    )
+
+    def __init__(self, url, max_connections=8):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.pool = ThreadedConnectionPool(1, max_connections, url)
+        with self._connection() as conn, conn.cursor() as cur:
+            for statement in self.SCHEMA:
+                cur.execute(statement)
+
+    @contextmanager
+    def _connection(self):
+        conn = self.pool.getconn()
+        try:
+            # Commits on success, rolls back on error
+            with conn:
+                yield conn
+        finally:
+            self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+    def _count(self, table):
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {table}")
+            return cur.fetchone()[0]
+
+    def count_users(self):
+        return self._count('users')
+
+    def count_teams(self):
+        return self._count('teams')
+
+    def _iter(self, table, chunk_size, key):
+        with self._connection() as conn:
+            # Named cursor: rows stay on the server until fetched
+            with conn.cursor(name=f'export_{table}') as cur:
+                cur.itersize = chunk_size
+                cur.execute(f"SELECT id, record FROM {table} ORDER BY id")
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield [(key(row_id), bytes(record)) for row_id, record in rows]
+
+    def iter_user_records(self, chunk_size=500):
+        return self._iter('users', chunk_size, int)
+
+    def iter_team_records(self, chunk_size=500):
+        return self._iter('teams', chunk_size, str)
+
+    def _put(self, table, pairs, key):
+        from psycopg2 import Binary
+        from psycopg2.extras import execute_values
+
+        rows = [(key(row_id), Binary(record)) for row_id, record in pairs]
+        with self._connection() as conn, conn.cursor() as cur:
+            execute_values(
+                cur,
+                f"INSERT INTO {table} (id, record) VALUES %s "
+                "ON CONFLICT (id) DO UPDATE SET record = EXCLUDED.record",
+                rows,
+                page_size=len(rows) or 1
+            )
+
+    def put_user_records(self, pairs):
+        self._put('users', pairs, int)
+
+    def put_team_records(self, pairs):
+        self._put('teams', pairs, str)
+
+
+def open_store(url):
+    """Storage backend for a URL: postgres://... or memory://"""
+    if not url or url.startswith('memory:'):
+        return MemoryStore()
+    if url.startswith(('postgres://', 'postgresql://')):
+        return PostgresStore(url)
+    raise ValueError(f"unsupported storage URL: {url}")
@@ -0,0 +1,142 @@
+"""Round trips and migrations of the binary user/team record format
+
+The V1-V3 fixtures were written by the encoders of those schema versions
+and must keep decoding to the same user as the format evolves.
+"""
+import base64
+import json
+
+import pytest
+
+from codec import (USER_MAGIC, USER_SCHEMA_VERSION, decode_team, decode_user, encode_team,
+                   encode_user, peek_language, record_version, upgrade_user)
+from models import Deferred, Habit, Task, User
+
+# User in the JSON dict layout used before the binary format (version 0)
+V0 = json.dumps({
+    'language': 'ar',
+    'monthly_goals': [{'goal': 'Run 50km', 'created': '2025-10-09T08:53:20', 'progress': 0, 'milestones': []}],
+    'habits': [{'habit': 'Read', 'tracking': ['2025-10-09', '2025-10-10', '2025-10-11'],
+                'streak': 3, 'best_streak': 5}],
+    'habit_streaks': {},
+    'tasks': [{'task': 'Call dentist', 'category': 'Work', 'recurring': None, 'time': '14:30',
+               'completed': False, 'created': '2025-10-09T08:53:21'}],
+    'recurring_tasks': [{'task': 'Stretch', 'category': 'Health', 'recurring': 'daily', 'time': None,
+                         'completed': False, 'created': '2025-10-09T08:53:20'}],
+    'completed_tasks': [{'task': 'Write report', 'category': 'Work', 'recurring': None, 'time': '14:30',
+                         'completed': True, 'created': '2025-10-09T08:53:20'}],
+    'categories': ['Work', 'Personal', 'Health'],
+    'pomodoro_settings': {'work': 25, 'break': 5, 'long_break': 15},
+    'pomodoro_count': 7,
+    'weekly_reports': [], 'monthly_reports': [], 'annual_reports': [],
+    'team_id': 't1',
+    'points': 42,
+    'achievements': ['Week Warrior - Read']
+}).encode('utf-8')
+
+V1 = base64.b64decode(
+    'UFUBAmFyKgAAAAAAAAAHAAAAGQAFAA8AcwIAAAB0MWwDAAAAcwQAAABXb3JrcwgAAABQZXJzb25h'
+    'bHMGAAAASGVhbHRobAEAAABzEwAAAFdlZWsgV2FycmlvciAtIFJlYWRtAAAAAGwDAAAAbAAAAABs'
+    'AAAAAGwAAAAAAQAIAAAAUnVuIDUwa20AeOdoAAAAAAAAbAAAAAABAAQAAABSZWFkAwAAAAUAAAAM'
+    'AAAAkk8AAJNPAACUTwAAAQAAAAwAAABDYWxsIGRlbnRpc3QEAAAAV29ya/////8FAAAAMTQ6MzAA'
+    'AXjnaAAAAAABAAAABwAAAFN0cmV0Y2gGAAAASGVhbHRoBQAAAGRhaWx5/////wAAeOdoAAAAADIA'
+    'AAABAAAADAAAAFdyaXRlIHJlcG9ydAQAAABXb3Jr/////wUAAAAxNDozMAEAeOdoAAAAAA=='
+)
+V2 = base64.b64decode(
+    'UFUCAmFyKgAAAAAAAAAHAAAAGQAFAA8AAwAAAHMCAAAAdDFsAwAAAHMEAAAAV29ya3MIAAAAUGVy'
+    'c29uYWxzBgAAAEhlYWx0aGwBAAAAcxMAAABXZWVrIFdhcnJpb3IgLSBSZWFkbQAAAABsAwAAAGwA'
+    'AAAAbAAAAABsAAAAAAEACAAAAFJ1biA1MGttAHjnaAAAAAAAAGwAAAAAAQAEAAAAUmVhZAMAAAAF'
+    'AAAADAAAAJJPAACTTwAAlE8AAAEAAAAMAAAAQ2FsbCBkZW50aXN0BAAAAFdvcmv/////BQAAADE0'
+    'OjMwAgAAAAABeOdoAAAAAAAAAAAAAAAAAQAAAAcAAABTdHJldGNoBgAAAEhlYWx0aAUAAABkYWls'
+    'ef////8AAAAAAAB452gAAAAAAAAAAAAAAAA+AAAAAQAAAAwAAABXcml0ZSByZXBvcnQEAAAAV29y'
+    'a/////8FAAAAMTQ6MzABAAAAAQB452gAAAAAEIbnaAAAAAA='
+)
+V3 = base64.b64decode(
+    'UFUDAmFyKgAAAAAAAAAHAAAAGQAFAA8AAwAAAAFzAgAAAHQxbAMAAABzBAAAAFdvcmtzCAAAAFBl'
+    'cnNvbmFscwYAAABIZWFsdGhsAQAAAHMTAAAAV2VlayBXYXJyaW9yIC0gUmVhZG0AAAAAbAMAAABs'
+    'AAAAAGwAAAAAbAAAAAABAAgAAABSdW4gNTBrbQB452gAAAAAAABsAAAAAAEABAAAAFJlYWQDAAAA'
+    'BQAAAAwAAACSTwAAk08AAJRPAAABAAAADAAAAENhbGwgZGVudGlzdAQAAABXb3Jr/////wUAAAAx'
+    'NDozMAIAAAAAAXjnaAAAAAAAAAAAAAAAAAEAAAAHAAAAU3RyZXRjaAYAAABIZWFsdGgFAAAAZGFp'
+    'bHn/////AAAAAAAAeOdoAAAAAAAAAAAAAAAAPgAAAAEAAAAMAAAAV3JpdGUgcmVwb3J0BAAAAFdv'
+    'cmv/////BQAAADE0OjMwAQAAAAEAeOdoAAAAABCG52gAAAAA'
+)
+
+
+def check_fixture_user(user):
+    assert user.language == 'ar'
+    assert user.points == 42 and user.pomodoro_count == 7 and user.team_id == 't1'
+    assert user.achievements == ['Week Warrior - Read']
+    assert [g.goal for g in user.monthly_goals] == ['Run 50km']
+    habit, = user.habits
+    assert (habit.habit, habit.streak, habit.best_streak) == ('Read', 3, 5)
+    assert habit.tracking.tolist() == [20370, 20371, 20372]
+    assert [(t.task, t.time, t.completed) for t in user.tasks] == [('Call dentist', '14:30', False)]
+    assert [(t.task, t.recurring) for t in user.recurring_tasks] == [('Stretch', 'daily')]
+    assert [(t.task, t.completed) for t in user.completed_tasks] == [('Write report', True)]
+    # Ids are unique after migration, and new tasks continue after them
+    task = user.add_task(Task('New'))
+    assert task.id not in [t.id for t in user.tasks if t is not task]
+
+
+def test_migrations_reach_current_version():
+    for record in (V0, V1, V2, V3):
+        upgraded = upgrade_user(record)
+        assert record_version(upgraded, USER_MAGIC) == USER_SCHEMA_VERSION
+        check_fixture_user(decode_user(record))
+        check_fixture_user(decode_user(upgraded))
+        assert peek_language(record) == 'ar'
+
+
+def test_current_record_is_not_rewritten():
+    record = encode_user(decode_user(V3))
+    assert upgrade_user(record) is record
+
+
+@pytest.fixture
+def user():
+    user = User('en')
+    user.set_goals(['Ship v2', 'Read 4 books'])
+    user.habits = [Habit('Run', [20000, 20001]), Habit('Meditate')]
+    user.link_habit(user.habits[0], 1)
+    for name in ('a', 'b', 'c'):
+        task = user.add_task(Task(name, 'Work', time='30'))
+    user.link_task(task, 0)
+    user.tasks.complete(1)
+    user.archive_completed()
+    user.recurring_tasks.append(Task('Stretch', 'Health', 'weekly'))
+    user.digest = False
+    user.achievements.append('First task')
+    user.habit_streaks = {'Run': 2}
+    return user
+
+
+def test_round_trip(user):
+    decoded = decode_user(encode_user(user))
+    assert decoded.to_dict() == user.to_dict()
+    # Encoding again without touching the lazy parts copies them through
+    assert encode_user(decode_user(encode_user(user))) == encode_user(user)
+
+
+def test_archive_appends_without_decoding(user):
+    user = decode_user(encode_user(user))
+    user.tasks.complete(2)
+    user.archive_completed()
+    assert type(user._completed_tasks) is Deferred
+    decoded = decode_user(encode_user(user))
+    assert [t.task for t in decoded.completed_tasks] == ['a', 'b']
+
+
+def test_done_on_reads_encoded_tracking(user):
+    user = decode_user(encode_user(user))
+    run, meditate = user.habits
+    assert run.done_on(20001) and not run.done_on(20000)
+    assert not meditate.done_on(20001)
+    # Neither tracking blob was decoded to answer
+    assert type(run._tracking) is Deferred and type(meditate._tracking) is Deferred
+
+
+def test_team_round_trip():
+    team = {'members': [1, 2, 3], 'shared_goals': ['Launch']}
+    assert decode_team(encode_team(team)) == team
+    assert decode_team(json.dumps(team).encode('utf-8')) == team
+
@@ -0,0 +1,51 @@
+"""Goal progress kept by linked tasks and habits"""
+import pytest
+
+from models import HABIT_TARGET, Habit, Task, User
+from quickadd import parse_line
+
+
+@pytest.fixture
+def user():
+    user = User()
+    user.set_goals(['Ship v2', 'Get fit'])
+    user.habits = [Habit('Run')]
+    return user
+
+
+def test_linked_habit_cannot_move_goals(user):
+    a, b = user.monthly_goals
+    habit = user.habits[0]
+    assert user.link_habit(habit, 0)
+    for _ in range(5):
+        a.advance()
+    user.link_task(user.add_task(Task('Write spec')), 0)
+
+    assert not user.link_habit(habit, 1)
+    assert user.link_habit(habit, 0)
+    assert (a.done, a.target, a.progress, a.milestones) == (5, HABIT_TARGET + 1, 16, [])
+    assert b.target == 0
+
+
+def test_done_never_passes_target(user):
+    goal = user.monthly_goals[0]
+    user.link_task(user.add_task(Task('Only task')), 0)
+    assert goal.advance() == [25, 50, 75, 100]
+    assert goal.advance() == []
+    assert (goal.done, goal.target, goal.progress) == (1, 1, 100)
+
+
+def test_new_goals_drop_links(user):
+    task = user.add_task(Task('Write spec'))
+    user.link_task(task, 1)
+    user.recurring_tasks.append(Task('Stretch', recurring='daily', goal=0))
+    user.link_habit(user.habits[0], 0)
+    user.set_goals(['Other'])
+    assert task.goal is None and user.recurring_tasks[0].goal is None and user.habits[0].goal is None
+
+
+def test_goal_tag_range():
+    assert parse_line('Write chapter +2')['goal'] == 1
+    assert parse_line('Call +15551234567') is None
+    assert parse_line('Call +4 30m')['task'] == 'Call +4'
+
@@ -0,0 +1,75 @@
+"""Pomodoro phase cycle, pausing and countdown edit scheduling"""
+import pytest
+
+from models import PomodoroSettings
+from pomodoro import (EDIT_BUDGET, LONG_BREAK, LONG_BREAK_EVERY, MIN_EDIT_INTERVAL, SHORT_BREAK, WORK,
+                      SessionManager)
+
+
+@pytest.fixture
+def manager():
+    return SessionManager()
+
+
+def live_session(manager, user_id, now=0.0):
+    session = manager.start(user_id, user_id, PomodoroSettings())
+    session.message_id = 1
+    session.begin(WORK, now=now)
+    manager.set_live(session, True)
+    return session
+
+
+def test_cycle_ends_after_long_break(manager):
+    session = manager.start(1, 1, PomodoroSettings())
+    phases = []
+    phase = WORK
+    while phase is not None:
+        phases.append(phase)
+        session.begin(phase, now=0.0)
+        if phase == WORK:
+            # As pomodoro_complete counts a finished work session
+            session.cycle += 1
+        phase = session.next_phase()
+    assert phases == [WORK, SHORT_BREAK] * (LONG_BREAK_EVERY - 1) + [WORK, LONG_BREAK]
+
+
+def test_pause_keeps_remaining_time(manager):
+    session = manager.start(1, 1, PomodoroSettings(work=25))
+    assert session.begin(WORK, now=100.0) == 25 * 60
+    session.pause(now=400.0)
+    assert session.paused and session.seconds_left(now=5000.0) == 25 * 60 - 300
+    # Pausing again does not restart the clock
+    session.pause(now=900.0)
+    assert session.resume(now=1000.0) == 25 * 60 - 300
+    assert not session.paused
+    assert session.seconds_left(now=1060.0) == 25 * 60 - 360
+
+
+def test_due_countdowns_respect_limit_and_interval(manager):
+    sessions = [live_session(manager, user_id) for user_id in range(1, 6)]
+    sessions[0].pause(now=0.0)
+    sessions[1].message_id = None
+
+    first = manager.due_countdowns(2, now=10.0)
+    assert len(first) == 2
+    second = manager.due_countdowns(10, now=10.0)
+    assert {s.user_id for s in first + second} == {3, 4, 5}
+    # Nothing is due again until the interval has passed
+    assert manager.due_countdowns(10, now=10.0 + MIN_EDIT_INTERVAL - 1) == []
+    assert len(manager.due_countdowns(10, now=10.0 + MIN_EDIT_INTERVAL)) == 3
+
+
+def test_edit_interval_grows_with_load(manager):
+    assert manager.edit_interval() == MIN_EDIT_INTERVAL
+    users = EDIT_BUDGET * MIN_EDIT_INTERVAL * 2
+    for user_id in range(users):
+        live_session(manager, user_id)
+    assert manager.edit_interval() == users / EDIT_BUDGET
+
+
+def test_end_clears_live(manager):
+    session = live_session(manager, 1)
+    assert manager.live == {1}
+    assert manager.end(1) is session
+    assert manager.live == set() and manager.get(1) is None
+    assert manager.end(1) is None
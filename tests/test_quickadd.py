@@ -0,0 +1,30 @@
+"""Quick-add annotations on /add lines"""
+from quickadd import parse_line, parse_lines
+
+CATEGORIES = ['Work', 'Personal', 'Health']
+
+
+def test_add_command_text():
+    # What add_tasks passes on from "/add ..." in a single message
+    text = "Finish report #work @14:30 !daily\nCall dentist #Health 30m\nBuy milk\n\n"
+    parsed, plain = parse_lines(text, CATEGORIES)
+    assert [(t['task'], t['category'], t['time'], t['recurring']) for t in parsed] == [
+        ('Finish report', 'Work', '14:30', 'daily'),
+        ('Call dentist', 'Health', '30', None),
+    ]
+    assert plain == ['Buy milk']
+
+
+def test_unknown_hashtag_stays_text():
+    task = parse_line('Review PR #42 #work', CATEGORIES)
+    assert (task['task'], task['category']) == ('Review PR #42', 'Work')
+    assert parse_line('Review PR #42', CATEGORIES) is None
+
+
+def test_annotations_only_at_end_of_line():
+    assert parse_line('Buy 2m cable') is None
+    assert parse_line('Fix #work laptop', CATEGORIES) is None
+    task = parse_line('Buy 2m cable 1h30m')
+    assert (task['task'], task['time']) == ('Buy 2m cable', '90')
+    # The last of two times wins, as written
+    assert parse_line('Standup @09:00 15min')['time'] == '15'
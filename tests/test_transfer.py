@@ -0,0 +1,64 @@
+"""Bulk export/import round trips through both formats"""
+import os
+import tempfile
+
+import pytest
+
+from codec import decode_user, encode_team, encode_user
+from models import Task, User
+from storage import MemoryStore
+from transfer import FORMATS, Checkpoint, export_to_file, import_from_file
+
+
+@pytest.fixture
+def source():
+    store = MemoryStore()
+    for user_id in range(1, 21):
+        user = User()
+        # User 1 has far more data than the csv module's default 128 KiB field limit
+        for t in range(1500 if user_id == 1 else 3):
+            task = user.add_task(Task(f"Task {t}, \"quoted\"\nwith a newline"))
+            user.tasks.complete(task.id)
+        user.archive_completed()
+        store.put_user_records([(user_id, encode_user(user))])
+    store.put_team_records([('t1', encode_team({'members': [1, 2], 'shared_goals': ['Launch']}))])
+    return store
+
+
+def test_round_trip_both_formats(source):
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"export.{fmt}.gz")
+            assert export_to_file(source, path) == 21
+            target = MemoryStore()
+            assert import_from_file(target, path, batch_size=4, workers=3) == 21
+            assert target.users.keys() == source.users.keys()
+            assert target.teams.keys() == source.teams.keys()
+            for user_id, record in source.users.items():
+                assert decode_user(target.users[user_id]).to_dict() == decode_user(record).to_dict()
+
+
+def test_resume_from_checkpoint(source):
+
+    class FailingStore(MemoryStore):
+        calls = 0
+
+        def put_user_records(self, pairs):
+            FailingStore.calls += 1
+            if FailingStore.calls == 3:
+                raise RuntimeError("connection lost")
+            super().put_user_records(pairs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.csv')
+        export_to_file(source, path)
+        target = FailingStore()
+        checkpoint = Checkpoint(os.path.join(tmp, 'import.checkpoint'))
+        try:
+            import_from_file(target, path, batch_size=4, workers=1, checkpoint=checkpoint)
+        except RuntimeError:
+            pass
+        assert Checkpoint(checkpoint.path).done == 8
+        assert import_from_file(target, path, batch_size=4, workers=2, checkpoint=Checkpoint(checkpoint.path)) == 21
+        assert target.users.keys() == source.users.keys()
+
@@ -0,0 +1,264 @@
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from codec import RecordError, decode_team, decode_user, encode_team, encode_user
+from models import User
+from storage import open_store
+
+# ==================== BULK EXPORT / IMPORT ====================
+#
+# Full-data export of users and teams, for GDPR requests and for moving
+# between storage backends (see storage.py). Every stage is a generator:
+# records are read from the store one chunk at a time, decoded, formatted
+# and written line by line, so memory stays flat however many users there
+# are. Two formats, one record per line / row:
+#
+#   ndjson  {"type": "user", "id": 42, "data": {...User.to_dict()...}}
+#   csv     type,id,data   (data is the same dict as compact JSON)
+#
+# Imports write batches from a small thread pool and keep a checkpoint
+# file with the number of input records safely stored. Batches are only
+# counted once every batch before them is done, so a resumed import
+# skips exactly that prefix; anything after it is written again, which
+# is harmless because stores replace records by id.
+#
+# Admin CLI (the store URL defaults to $DATABASE_URL):
+#
+#   python transfer.py export users.ndjson.gz
+#   python transfer.py import users.ndjson.gz --workers 4 --checkpoint users.ckpt
+
+FORMATS = ('ndjson', 'csv')
+CSV_FIELDS = ('type', 'id', 'data')
+# A heavy user's data column runs to megabytes; the csv module's default
+# limit is 128 KiB. 2**31 - 1 is the largest value every platform accepts.
+CSV_FIELD_LIMIT = 2 ** 31 - 1
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+# ---------- export ----------
+
+def export_records(store, chunk_size=500):
+    """Yield (type, id, data) for every user, then every team"""
+    for chunk in store.iter_user_records(chunk_size):
+        for user_id, record in chunk:
+            yield 'user', user_id, decode_user(record).to_dict()
+    for chunk in store.iter_team_records(chunk_size):
+        for team_id, record in chunk:
+            yield 'team', team_id, decode_team(record)
+
+
+def format_ndjson(records):
+    for kind, key, data in records:
+        yield _dumps({'type': kind, 'id': key, 'data': data}) + '\n'
+
+
+def format_csv(records):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(CSV_FIELDS)
+    for kind, key, data in records:
+        writer.writerow((kind, key, _dumps(data)))
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    # Header only, when there were no records
+    if buf.tell():
+        yield buf.getvalue()
+
+
+FORMATTERS = {'ndjson': format_ndjson, 'csv': format_csv}
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def open_text(path, mode):
+    """Text file, gzip-compressed when the name ends in .gz; '-' is stdin/stdout"""
+    if path == '-':
+        stream = sys.stdin if 'r' in mode else sys.stdout
+        return open(stream.fileno(), mode, encoding='utf-8', newline='', closefd=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def export_to_file(store, path, fmt=None, chunk_size=500):
+    """Write every user and team to path; returns the number of records"""
+    fmt = fmt or detect_format(path)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in export_records(store, chunk_size):
+            count += 1
+            yield record
+
+    with open_text(path, 'w') as out:
+        out.writelines(FORMATTERS[fmt](counted()))
+    return count
+
+
+# ---------- import ----------
+
+def parse_ndjson(lines):
+    for line in lines:
+        if line.strip():
+            item = json.loads(line)
+            yield item['type'], item['id'], item['data']
+
+
+def parse_csv(lines):
+    csv.field_size_limit(CSV_FIELD_LIMIT)
+    for row in csv.DictReader(lines):
+        key = row['id']
+        # CSV has no types; user ids are Telegram's integer ids
+        if row['type'] == 'user':
+            key = int(key)
+        yield row['type'], key, json.loads(row['data'])
+
+
+PARSERS = {'ndjson': parse_ndjson, 'csv': parse_csv}
+
+
+class Checkpoint:
+    """How many input records of an import are stored, kept in a small file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = json.load(f)['done']
+
+    def save(self, done):
+        self.done = done
+        if not self.path:
+            return
+        # Write then rename, so a crash never leaves a torn checkpoint
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'done': done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.done = 0
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _store_batch(store, batch):
+    users = []
+    teams = []
+    for kind, key, data in batch:
+        if kind == 'user':
+            users.append((key, encode_user(User.from_dict(data))))
+        elif kind == 'team':
+            teams.append((key, encode_team(data)))
+        else:
+            raise RecordError(f"unknown record type {kind!r}")
+    if users:
+        store.put_user_records(users)
+    if teams:
+        store.put_team_records(teams)
+    return len(batch)
+
+
+def import_records(records, store, batch_size=500, workers=4, checkpoint=None, progress=None):
+    """Store (type, id, data) records in batches; returns the number stored
+
+    With a checkpoint, records it already counts are skipped and it is
+    advanced as batches complete in order. At most 2 * workers batches
+    are in flight, which bounds memory on the reading side too.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    done = checkpoint.done
+    records = itertools.islice(records, done, None)
+    in_flight = deque()
+
+    def settle(block):
+        nonlocal done
+        while in_flight and (block or in_flight[0].done()):
+            done += in_flight.popleft().result()
+            checkpoint.save(done)
+            if progress:
+                progress(done)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            if len(in_flight) >= workers * 2:
+                in_flight[0].result()
+            in_flight.append(pool.submit(_store_batch, store, batch))
+            settle(block=False)
+        settle(block=True)
+    return done
+
+
+def import_from_file(store, path, fmt=None, batch_size=500, workers=4, checkpoint=None, progress=None):
+    fmt = fmt or detect_format(path)
+    with open_text(path, 'r') as f:
+        return import_records(PARSERS[fmt](f), store, batch_size, workers, checkpoint, progress)
+
+
+# ---------- admin CLI ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk export/import of user and team records")
+    parser.add_argument('--database', default=os.getenv('DATABASE_URL'),
+                        help="storage URL (default: $DATABASE_URL)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="write every record to a file ('-' for stdout)")
+    export.add_argument('path')
+    export.add_argument('--format', choices=FORMATS)
+    export.add_argument('--chunk-size', type=int, default=500)
+
+    restore = commands.add_parser('import', help="load records from a file ('-' for stdin)")
+    restore.add_argument('path')
+    restore.add_argument('--format', choices=FORMATS)
+    restore.add_argument('--batch-size', type=int, default=500)
+    restore.add_argument('--workers', type=int, default=4)
+    restore.add_argument('--checkpoint', help="resume file (default: PATH.checkpoint)")
+    restore.add_argument('--restart', action='store_true', help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+    if not args.database:
+        # A fresh in-process store is always empty
+        parser.error("no storage URL: pass --database or set DATABASE_URL")
+
+    store = open_store(args.database)
+    if args.command == 'export':
+        count = export_to_file(store, args.path, args.format, args.chunk_size)
+        print(f"exported {count} records", file=sys.stderr)
+        return
+
+    path = args.checkpoint or (None if args.path == '-' else args.path + '.checkpoint')
+    checkpoint = Checkpoint(path)
+    if args.restart:
+        checkpoint.clear()
+    if checkpoint.done:
+        print(f"resuming after {checkpoint.done} records", file=sys.stderr)
+
+    def progress(done):
+        print(f"\r{done} records", end='', file=sys.stderr)
+
+    count = import_from_file(store, args.path, args.format, args.batch_size, args.workers, checkpoint, progress)
+    print(f"\rimported {count} records", file=sys.stderr)
+    # Finished: a later run of the same file starts over
+    checkpoint.clear()
+
+
+if __name__ == '__main__':
+    main()
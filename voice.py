@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import re
+
+from workers import BoundedPool, PoolFull
+
+# ==================== VOICE NOTES ====================
+#
+# Voice notes arrive as OGG/Opus. ffmpeg (from the aptfile) decodes them
+# to 16 kHz mono PCM through its stdin/stdout pipes, with no temp files,
+# and the PCM goes to a worker process running the offline Vosk
+# recognizer. The pipeline admits a fixed number of notes at once; the
+# rest are refused with PoolFull so a burst of voice notes can't starve
+# the text handlers.
+
+SAMPLE_RATE = 16000
+FFMPEG_TIMEOUT = 60
+MODEL_PATH = os.getenv('VOSK_MODEL_PATH', 'model')
+
+# Spoken separators between tasks: "buy milk next task call the dentist".
+# A bare "next" is ordinary speech ("next week"), so it doesn't count.
+_SEPARATORS = re.compile(r'\b(?:next task|new task|and then)\b')
+
+# Loaded once per worker process, on its first job
+_model = None
+
+
+async def transcode(ogg):
+    """OGG/Opus bytes to 16-bit little-endian mono PCM at SAMPLE_RATE"""
+    process = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-loglevel', 'error', '-i', 'pipe:0',
+        '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', 'pipe:1',
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        pcm, errors = await asyncio.wait_for(process.communicate(ogg), FFMPEG_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}: {errors.decode(errors='replace')}")
+    return pcm
+
+
+def model_available():
+    """Whether the Vosk model directory exists; voice notes need it"""
+    return os.path.isdir(MODEL_PATH)
+
+
+def speech_to_text(pcm):
+    """Transcribe PCM audio; runs in a worker process"""
+    global _model
+    from vosk import Model, KaldiRecognizer
+
+    if _model is None:
+        _model = Model(MODEL_PATH)
+    recognizer = KaldiRecognizer(_model, SAMPLE_RATE)
+
+    parts = []
+    for start in range(0, len(pcm), 8000):
+        if recognizer.AcceptWaveform(pcm[start:start + 8000]):
+            parts.append(json.loads(recognizer.Result()).get('text', ''))
+    parts.append(json.loads(recognizer.FinalResult()).get('text', ''))
+    return ' '.join(p for p in parts if p)
+
+
+def split_spoken_tasks(text):
+    return [part.strip() for part in _SEPARATORS.split(text) if part.strip()]
+
+
+class VoicePipeline:
+    """Caps voice notes in flight across transcoding and recognition"""
+
+    def __init__(self, workers=1, transcoders=2, max_pending=4):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.pool = BoundedPool(workers=workers, max_pending=max_pending)
+        self._transcoders = asyncio.Semaphore(transcoders)
+
+    @property
+    def full(self):
+        return self.pending >= self.max_pending
+
+    async def transcribe(self, ogg):
+        """Task lines spoken in a voice note"""
+        if self.full:
+            raise PoolFull()
+        self.pending += 1
+        try:
+            async with self._transcoders:
+                pcm = await transcode(ogg)
+            text = await self.pool.submit(speech_to_text, pcm)
+        finally:
+            self.pending -= 1
+        return split_spoken_tasks(text)
@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+# ==================== WORKER POOLS ====================
+#
+# CPU-heavy jobs (OCR, speech-to-text) run in worker processes so the
+# event loop keeps serving text handlers. Each pool admits a fixed number
+# of jobs in flight and refuses more with PoolFull instead of queueing
+# without bound; callers tell the user to retry.
+#
+# Workers come from a forkserver rather than a fork of the bot, which
+# runs threads (the job queue, the scheduler) that fork would copy
+# mid-lock, and would duplicate the bot's memory into every worker.
+
+
+class PoolFull(Exception):
+    pass
+
+
+class BoundedPool:
+    """Process pool that admits at most max_pending jobs at once"""
+
+    def __init__(self, workers=2, max_pending=8):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Worker processes are only started once something is submitted
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('forkserver'))
+        return self._executor
+
+    @property
+    def full(self):
+        return self.pending >= self.max_pending
+
+    async def submit(self, fn, *args):
+        if self.full:
+            raise PoolFull()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class RateLimiter:
+    """At most `limit` events per `period` seconds for each key"""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self._events = defaultdict(deque)
+
+    def allow(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        events = self._events[key]
+        while events and events[0] <= now - self.period:
+            events.popleft()
+        if len(events) >= self.limit:
+            return False
+        events.append(now)
+        return True